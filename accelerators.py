@@ -0,0 +1,100 @@
+"""
+Optional compiled backends for the transforms.
+
+Nothing in here is required to draw a pattern. When numba isn't installed ``njit`` becomes a
+no-op decorator, ``prange`` falls back to ``range`` and ``HAVE_NUMBA`` is False, so callers
+should check the flag and keep using their vectorized NumPy code instead of the (then pure
+Python, and very slow) kernels. Likewise ``HAVE_NUMEXPR`` guards ``numexpr_evaluate``.
+``sincos`` is safe to call either way and picks its own backend.
+"""
+import math
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+try:
+    import numexpr
+except ImportError:
+    numexpr = None
+
+HAVE_NUMBA = numba is not None
+HAVE_NUMEXPR = numexpr is not None
+
+# Scalar math.sin/cos kernels only outrun NumPy's SIMD sin/cos loops when numba can vectorize
+# them (SVML) or spread them over several threads
+PREFER_TRIG_KERNELS = HAVE_NUMBA and (numba.config.USING_SVML or numba.config.NUMBA_NUM_THREADS > 1)
+
+if HAVE_NUMBA:
+    njit = numba.njit
+    prange = numba.prange
+else:
+    def njit(*args, **kwargs):
+        # Support both @njit and @njit(parallel=True, ...)
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+    prange = range
+
+
+def limit_kernel_threads():
+    """
+    Runs numba's parallel kernels on a single thread, for processes that are already one of
+    several running side by side (e.g. pool workers).
+    """
+    if HAVE_NUMBA:
+        numba.set_num_threads(1)
+
+
+def numexpr_evaluate(expression, theta, out=None, **operands):
+    """
+    Evaluates an elementwise expression with numexpr in a single pass, without temporaries.
+    :param expression: numexpr expression; may refer to theta and to any of the operands.
+    :param theta: Angle values; the result has theta's dtype.
+    :param out: Optional array to write the result into.
+    :param operands: Arrays and scalars used in the expression. Scalars are cast to theta's dtype,
+                     otherwise numexpr treats Python floats as double and upcasts float32 arrays.
+    :return: The evaluated array.
+    """
+    scalar_type = theta.dtype.type
+    local_dict = {name: value if isinstance(value, np.ndarray) else scalar_type(value)
+                  for name, value in operands.items()}
+    local_dict['theta'] = theta
+    return numexpr.evaluate(expression, local_dict=local_dict, out=out)
+
+
+def prefer_numexpr_trig(dtype):
+    """
+    :param dtype: dtype the expression is evaluated in.
+    :return: True if numexpr should evaluate a sin/cos-heavy expression. Single-threaded and without
+             VML, numexpr's float32 sin/cos are slower than NumPy's SIMD loops; float64 still gains.
+    """
+    return HAVE_NUMEXPR and (numexpr.use_vml or numexpr.nthreads > 1 or dtype == np.float64)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _sincos_kernel(angle, sin_out, cos_out):
+    for i in prange(angle.shape[0]):
+        sin_out[i] = math.sin(angle[i])
+        cos_out[i] = math.cos(angle[i])
+
+
+def sincos(angle):
+    """
+    Computes the sine and cosine of the same angles. With numba, float64 angles are handled in a
+    single parallel pass rather than one pass each for np.sin and np.cos. float32 angles always use
+    NumPy, whose SIMD float32 sin/cos loops outrun a libm call per element.
+    :param angle: Angle values (array or scalar)
+    :return: Tuple of (sin(angle), cos(angle)), in angle's dtype.
+    """
+    if not HAVE_NUMBA or np.ndim(angle) == 0 or np.asarray(angle).dtype != np.float64:
+        return np.sin(angle), np.cos(angle)
+    angle = np.ascontiguousarray(angle)
+    sin_out = np.empty_like(angle)
+    cos_out = np.empty_like(angle)
+    _sincos_kernel(angle.reshape(-1), sin_out.reshape(-1), cos_out.reshape(-1))
+    return sin_out, cos_out
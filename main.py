@@ -1,66 +1,232 @@
-import matplotlib.pyplot as plt
-from patterns import Patterns
+import multiprocessing
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from patterns import Patterns, transform
 import numpy as np
+from accelerators import limit_kernel_threads
+from pipeline import apply_transforms
 from standard_transforms import translate_scale_rotate_transform
-def draw_pattern(patterns_meta, filename=None):
+
+COORDINATE_DTYPE = np.float32
+
+# Sampling density along theta, capped so long patterns stay tractable
+POINTS_PER_REVOLUTION = 300
+MAX_POINTS = 100_000
+
+# SVG output canvas size (points), decimals written per coordinate, and how far (in points)
+# write_svg may move the line when it drops points that add no visible detail
+SVG_SIZE = 576
+SVG_PRECISION = 2
+SVG_TOLERANCE = 0.05
+# Points per span _simplify_polyline starts from
+SIMPLIFY_WINDOW = 32
+
+
+def write_svg(filename, lines, size=SVG_SIZE, precision=SVG_PRECISION, tolerance=SVG_TOLERANCE):
     """
-    Draws multiple patterns on the same canvas after applying different sets of transformations.
-    :param patterns_meta: List of dictionaries, where each dictionary contains:
-                          - 'pattern': A dictionary with 'transforms' (list of transformation functions)
-                                       and 'rotations' (number of rotations for the pattern).
-                          - 'translations': Optional dictionary with 'x_offset', 'y_offset', 'scale_x', 'scale_y', 'rotation_angle'.
-    :param filename: Optional. If provided, saves the plot to the specified filename as an SVG.
+    Writes polylines straight to an SVG file, without going through matplotlib's renderer.
+    :param filename: Path of the SVG file to write.
+    :param lines: List of (N, 2) arrays of x, y points, one polyline per pattern.
+    :param size: Size in points of the longer side of the drawing.
+    :param precision: Number of decimals written per coordinate (in points).
+    :param tolerance: Largest distance (in points) a dropped point may lie from the simplified line.
+    """
+    all_points = np.concatenate(lines)
+    min_x, min_y = all_points.min(axis=0)
+    max_x, max_y = all_points.max(axis=0)
+    margin = 0.02 * max(max_x - min_x, max_y - min_y)
+    min_x, min_y, max_x, max_y = min_x - margin, min_y - margin, max_x + margin, max_y + margin
+    scale = size / max(max_x - min_x, max_y - min_y)
+
+    polylines = []
+    for line in lines:
+        # Map onto the canvas; SVG's y axis points down, so flip y to keep patterns the same way up
+        points = np.empty(line.shape)
+        points[:, 0] = (line[:, 0] - min_x) * scale
+        points[:, 1] = (max_y - line[:, 1]) * scale
+
+        # Drop the points that add no visible detail, then any that land on the same rounded
+        # position as the point before them
+        points = np.round(_simplify_polyline(points, tolerance), precision)
+        keep = np.ones(len(points), dtype=bool)
+        keep[1:] = np.any(points[1:] != points[:-1], axis=1)
+        polylines.append(points[keep])
+
+    width = (max_x - min_x) * scale
+    height = (max_y - min_y) * scale
+    point_format = '%.{0}f,%.{0}f'.format(precision)
+    with open(filename, 'w') as svg_file:
+        svg_file.write('<svg xmlns="http://www.w3.org/2000/svg" width="{0:g}pt" height="{1:g}pt" '
+                       'viewBox="0 0 {0:g} {1:g}">\n'.format(width, height))
+        for points in polylines:
+            svg_file.write('<polyline fill="none" stroke="black" stroke-width="0.5" points="')
+            # One format call for the whole polyline rather than one per point
+            svg_file.write(' '.join([point_format] * len(points)) % tuple(points.ravel().tolist()))
+            svg_file.write('"/>\n')
+        svg_file.write('</svg>\n')
+
+
+def _simplify_polyline(points, tolerance):
+    """
+    Ramer-Douglas-Peucker simplification: keeps the endpoints, then recursively keeps the point
+    farthest from the chord of each span until every dropped point is within tolerance of it.
+    Every open span is split in the same vectorized pass, so there is one pass per level of the
+    recursion rather than one per kept point.
+    :param points: (N, 2) array of x, y points.
+    :param tolerance: Largest distance a dropped point may lie from the simplified line.
+    :return: (M, 2) array of the kept points, in order.
+    """
+    num_points = len(points)
+    if num_points < 3:
+        return points
+    # Start from short windows rather than one span over the whole pattern: a spiral's farthest
+    # point tends to sit near the ends of a long span, which would take a pass per turn to split
+    starts = np.arange(0, num_points - 1, SIMPLIFY_WINDOW)
+    ends = np.minimum(starts + SIMPLIFY_WINDOW, num_points - 1)
+    keep = np.zeros(num_points, dtype=bool)
+    keep[starts] = True
+    keep[-1] = True
+    still_open = ends - starts > 1
+    starts = starts[still_open]
+    ends = ends[still_open]
+
+    while len(starts):
+        # Interior points of every open span, laid out span after span
+        counts = ends - starts - 1
+        span = np.repeat(np.arange(len(starts)), counts)
+        span_offsets = np.cumsum(counts) - counts
+        index = np.arange(len(span)) - span_offsets[span] + starts[span] + 1
+
+        # Distance of each interior point from its span's chord (or from the start, for a closed span)
+        start_points = points[starts]
+        chords = points[ends] - start_points
+        chord_lengths = np.hypot(chords[:, 0], chords[:, 1])
+        offsets = points[index] - start_points[span]
+        cross = np.abs(chords[span, 0] * offsets[:, 1] - chords[span, 1] * offsets[:, 0])
+        distances = np.divide(cross, chord_lengths[span], out=np.hypot(offsets[:, 0], offsets[:, 1]),
+                              where=chord_lengths[span] > 0)
+
+        # Split each span at its farthest point if that lies outside the tolerance
+        farthest = np.maximum.reduceat(distances, span_offsets)
+        split = farthest > tolerance
+        on_max = np.flatnonzero(distances == farthest[span])
+        first_span, first = np.unique(span[on_max], return_index=True)
+        split_index = np.empty(len(starts), dtype=index.dtype)
+        split_index[first_span] = index[on_max[first]]
+        keep[split_index[split]] = True
+
+        # The two halves of each split span are open if they still have interior points
+        starts = np.concatenate((starts[split], split_index[split]))
+        ends = np.concatenate((split_index[split], ends[split]))
+        still_open = ends - starts > 1
+        starts = starts[still_open]
+        ends = ends[still_open]
+    return points[keep]
+
+
+def _render_pattern(meta):
+    """
+    Computes the points of a single pattern. Kept at module level so worker processes can run it.
+    :param meta: Dictionary with 'pattern' and optional 'translations' (see draw_pattern).
+    :return: (N, 2) array of x, y points.
     """
-    plt.figure(figsize=(8, 8))
-
-    for meta in patterns_meta:
-        pattern = meta['pattern']
-        transforms = pattern['transforms']
-        rotations = pattern['rotations']
-
-        # Optional translation parameters
-        translations = meta.get('translations', {})
-        x_offset = translations.get('x_offset', 0)
-        y_offset = translations.get('y_offset', 0)
-        scale_x = translations.get('scale_x', 1.0)
-        scale_y = translations.get('scale_y', 1.0)
-        rotation_angle = translations.get('rotation_angle', 0)
-
-        theta = np.linspace(0, 2 * np.pi * rotations, 50000)  # Increased resolution
-        x = np.zeros_like(theta)
-        y = np.zeros_like(theta)
-
-        # Apply transformations for each set interleaved with optional translations
-        for transform_func in transforms:
-            # Apply the current pattern-specific transformation
-            x, y = transform_func(x, y, theta)
-
-            # Apply translation, scaling, and rotation
-        x, y = translate_scale_rotate_transform(
-            x, y, theta,
+    pattern = meta['pattern']
+    transforms = pattern['transforms']
+    rotations = pattern['rotations']
+
+    # Optional translation parameters
+    translations = meta.get('translations', {})
+    x_offset = translations.get('x_offset', 0)
+    y_offset = translations.get('y_offset', 0)
+    scale_x = translations.get('scale_x', 1.0)
+    scale_y = translations.get('scale_y', 1.0)
+    rotation_angle = translations.get('rotation_angle', 0)
+
+    num_points = min(int(POINTS_PER_REVOLUTION * rotations), MAX_POINTS)
+    # Computed once here and handed to every transform, rather than each one reading theta[-1]
+    theta_span = 2.0 * np.pi * rotations
+    # float32 is plenty for plotting and halves the memory every transform streams through
+    theta = np.linspace(0, theta_span, num_points, dtype=COORDINATE_DTYPE)
+    # Start from the origin; the first transform broadcasts it, so no zero arrays are needed
+    x = y = 0.0
+
+    # Apply the pattern-specific transformations followed by translation, scaling, and rotation
+    x, y = apply_transforms(transforms + [
+        transform(
+            translate_scale_rotate_transform,
             x_offset=x_offset,
             y_offset=y_offset,
             scale_x=scale_x,
             scale_y=scale_y,
             rotation_angle=rotation_angle
         )
+    ], x, y, theta, theta_span)
 
-        # Plot the pattern on the same canvas
-        plt.plot(x, y, lw=0.5, color='black')
+    return np.column_stack([x, y]).astype(COORDINATE_DTYPE, copy=False)
 
-    # Set plot settings
-    plt.axis('equal')
-    plt.axis('off')
-    plt.tight_layout()
 
-    # Save the figure as an SVG file if a filename is provided
+def draw_pattern(patterns_meta, filename=None):
+    """
+    Draws multiple patterns on the same canvas after applying different sets of transformations.
+    :param patterns_meta: List of dictionaries, where each dictionary contains:
+                          - 'pattern': A dictionary with 'transforms' (list of transformation functions)
+                                       and 'rotations' (number of rotations for the pattern).
+                          - 'translations': Optional dictionary with 'x_offset', 'y_offset', 'scale_x', 'scale_y', 'rotation_angle'.
+    :param filename: Optional. If provided, saves the patterns to the specified filename as an SVG,
+                     otherwise displays them.
+    """
+    # One (N, 2) polyline per pattern; patterns don't share any state, so render them in parallel
+    # when there is more than one pattern and more than one CPU to spread them over
+    workers = min(len(patterns_meta), os.cpu_count() or 1)
+    if workers > 1 and _picklable(patterns_meta):
+        # Spawned rather than forked workers: forking after numba's threads have started can hang
+        # or break the pool. Each worker keeps its kernels to one thread, the pool is the parallelism
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=limit_kernel_threads) as executor:
+            lines = list(executor.map(_render_pattern, patterns_meta))
+    else:
+        lines = [_render_pattern(meta) for meta in patterns_meta]
+
+    # Save the patterns as an SVG file if a filename is provided
     if filename:
-        plt.savefig(filename, format='svg')
+        write_svg(filename, lines)
+        return
+
+    # matplotlib is only needed for the interactive window; SVG export above never loads it
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import LineCollection
+
+    # Plot all patterns on the same canvas, drawn together as a single collection.
+    # The figure is driven through its own methods; pyplot just provides the window.
+    fig = plt.figure(figsize=(8, 8))
+    ax = fig.add_subplot(1, 1, 1)
+    ax.add_collection(LineCollection(lines, linewidths=0.5, colors='black'))
+
+    # Set plot settings
+    ax.set_aspect('equal', adjustable='datalim')
+    ax.autoscale_view()
+    ax.set_axis_off()
+    fig.tight_layout()
 
     # Display the plot
     plt.show()
 
 
+def _picklable(patterns_meta):
+    """
+    :param patterns_meta: List of pattern dictionaries (see draw_pattern).
+    :return: True if the patterns can be sent to worker processes; custom callables such as
+             lambdas can't, so those patterns are rendered in this process instead.
+    """
+    try:
+        pickle.dumps(patterns_meta)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return False
+    return True
+
+
 def generate_pattern():
     patterns = Patterns()
     patterns_meta = [
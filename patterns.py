@@ -1,31 +1,34 @@
 import spiral_transforms
 import standard_transforms
 import spirograph_transforms
+from pipeline import make_transform
 from svgpathtools import svg2paths
 
 def transform(transform_func, *args, **kwargs):
-    return lambda x, y, theta: transform_func(x, y, theta, *args, **kwargs)
+    return make_transform(transform_func, args, kwargs)
 
 class Patterns():
 
     def __init__(self):
-        self.patterns = {
-            'croissant': self.create_croissant_pattern(),
-            'tube': self.create_tube_pattern(),
-            'simple_pent_transform': self.create_simple_pent_transform_pattern(),
-            'meta_spiral': self.meta_spiral(),
-            'transform_set_2': self.create_transform_set_2(),
-            'triangle_test': self.create_triangle_test_pattern(),
-            'classic_spirograph': self.create_classic_spirograph_pattern(),
-            'rectangle_spirograph': self.create_rectangle_spirograph_pattern(),
-            'n_gon_test': self.create_n_gon_test_pattern(),
-            'scramble': self.create_scramble_pattern(),
-            'x_ray_shell': self.create_x_ray_shell_pattern(),
-            'banana': self.create_banana_pattern(),
-            'another_simple_shell': self.create_another_simple_snail_pattern(),
-            'create_simple_snail_pattern': self.create_simple_snail_pattern(),
-            'create_sparse_shell_pattern': self.create_sparse_shell_pattern(),
-        }
+        # Patterns are only built on first use; some load SVG files from disk
+        self._builders = {
+            'croissant': self.create_croissant_pattern,
+            'tube': self.create_tube_pattern,
+            'simple_pent_transform': self.create_simple_pent_transform_pattern,
+            'meta_spiral': self.meta_spiral,
+            'transform_set_2': self.create_transform_set_2,
+            'triangle_test': self.create_triangle_test_pattern,
+            'classic_spirograph': self.create_classic_spirograph_pattern,
+            'rectangle_spirograph': self.create_rectangle_spirograph_pattern,
+            'n_gon_test': self.create_n_gon_test_pattern,
+            'scramble': self.create_scramble_pattern,
+            'x_ray_shell': self.create_x_ray_shell_pattern,
+            'banana': self.create_banana_pattern,
+            'another_simple_shell': self.create_another_simple_snail_pattern,
+            'create_simple_snail_pattern': self.create_simple_snail_pattern,
+            'create_sparse_shell_pattern': self.create_sparse_shell_pattern,
+        }
+        self._cache = {}
 
     def load_svg_path(self, svg_filename):
         """
@@ -124,7 +127,8 @@ class Patterns():
     def create_n_gon_test_pattern(self):
         return {
             'transforms': [
-                transform(spiral_transforms.variable_spiral_ngon_transform, 0.9, 0.01, [1, 3, 3, 3, 3]),
+                transform(spiral_transforms.variable_spiral_ngon_apply, 0.9, 0.01,
+                          spiral_transforms.build_ngon_vertices([1, 3, 3, 3, 3])),
                 transform(standard_transforms.linear_translation_transform, 4000, 45),
                 transform(standard_transforms.paper_rotation, degrees=70),
                 transform(standard_transforms.circular_motion, radius=100, speed=0.015),
@@ -204,7 +208,11 @@ class Patterns():
 
 
     def get_pattern(self, name):
-        return self.patterns.get(name)
+        if name not in self._builders:
+            return None
+        if name not in self._cache:
+            self._cache[name] = self._builders[name]()
+        return self._cache[name]
 
 
 
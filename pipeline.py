@@ -0,0 +1,363 @@
+import math
+from collections import namedtuple
+from functools import lru_cache
+from inspect import signature
+
+import numpy as np
+
+import spiral_transforms
+import spirograph_transforms
+import standard_transforms
+from accelerators import HAVE_NUMBA, njit, prange, sincos
+
+
+class Transform(namedtuple('Transform', ['func', 'args', 'kwargs', 'op_id', 'params'])):
+    """
+    A transform function with its pattern parameters bound. Called as transform(x, y, theta).
+    op_id and params are the record lowered for apply_pipeline (see make_transform);
+    op_id is OP_PYTHON when the transform can only run as a Python function.
+    The optional context (see theta_context) is forwarded to the transform for whichever of
+    its values the transform function accepts as keyword arguments, and likewise the optional
+    out buffers if the transform function takes an out argument.
+    """
+    __slots__ = ()
+
+    def __call__(self, x, y, theta, context=None, out=None):
+        shared = {}
+        if context:
+            shared = {name: context[name] for name in context_params(self.func) if name in context}
+        if out is not None and accepts_out(self.func):
+            shared['out'] = out
+        return self.func(x, y, theta, *self.args, **self.kwargs, **shared)
+
+
+# Per-pattern values that depend only on theta, computed once and shared by every stage
+CONTEXT_KEYS = ('cos_theta', 'sin_theta', 'theta_max')
+
+
+@lru_cache(maxsize=None)
+def context_params(func):
+    """
+    :param func: A transform function.
+    :return: The CONTEXT_KEYS that func accepts as keyword arguments.
+    """
+    return tuple(name for name in signature(func).parameters if name in CONTEXT_KEYS)
+
+
+@lru_cache(maxsize=None)
+def accepts_out(func):
+    """
+    :param func: A transform function.
+    :return: True if func can write its result into caller-provided buffers (an out argument).
+    """
+    return 'out' in signature(func).parameters
+
+
+def theta_context(theta, theta_max=None):
+    """
+    Computes the shared per-pattern values for theta.
+    :param theta: Angle values
+    :param theta_max: Final angle of the pattern, if already known (defaults to theta[-1])
+    :return: Dictionary with 'cos_theta', 'sin_theta' and 'theta_max'
+    """
+    theta_max = float(theta[-1]) if theta_max is None else theta_max
+    sin_theta, cos_theta = sincos(theta)
+    return {'cos_theta': cos_theta, 'sin_theta': sin_theta, 'theta_max': theta_max}
+
+
+# Op ids understood by apply_pipeline
+OP_PYTHON = -1
+OP_SPIRAL = 0
+OP_SPIRAL_OSCILLATOR = 1
+OP_VARIABLE_SPIRAL = 2
+OP_CIRCULAR_MOTION = 3
+OP_PAPER_ROTATION = 4
+OP_PAPER_ROTATION_NON_LINEAR = 5
+OP_LINEAR_TRANSLATION = 6
+OP_MYSTERY_LINES = 7
+OP_TRANSLATE_SCALE_ROTATE = 8
+OP_SPIROGRAPH = 9
+OP_ELLIPTICAL_SPIROGRAPH = 10
+OP_POLYGON_SPIROGRAPH = 11
+OP_SPIROGRAPH_RECTANGLE = 12
+
+# Codes the kernel understands for each string parameter. Anything else (e.g. a custom
+# rotation_rate_function, or a mode meant for another transform) keeps the transform on the
+# Python path, which raises its own error for invalid values.
+ROTATION_RATE_CODES = {'linear': 0, 'quadratic': 1, 'sinusoidal': 2}
+
+# Fusable transform -> (op id, parameter names in the order the kernel reads them,
+#                       code table of each string parameter)
+FUSED_OPS = {
+    spiral_transforms.spiral_transform: (OP_SPIRAL, ('spiral_rate', 'a', 'b'), {}),
+    spiral_transforms.spiral_oscillator: (OP_SPIRAL_OSCILLATOR, ('spiral_rate', 'frequency', 'const', 'a', 'b'),
+                                          {}),
+    spiral_transforms.variable_spiral_transform: (OP_VARIABLE_SPIRAL, ('start_rate', 'end_rate', 'a', 'b'), {}),
+    standard_transforms.circular_motion: (OP_CIRCULAR_MOTION, ('radius', 'speed'), {}),
+    standard_transforms.paper_rotation: (OP_PAPER_ROTATION, ('degrees',), {}),
+    standard_transforms.paper_rotation_transform_non_linear: (OP_PAPER_ROTATION_NON_LINEAR,
+                                                              ('degrees', 'rotation_rate_function'),
+                                                              {'rotation_rate_function': ROTATION_RATE_CODES}),
+    standard_transforms.linear_translation_transform: (OP_LINEAR_TRANSLATION,
+                                                       ('total_distance', 'movement_angle_degrees'), {}),
+    standard_transforms.mystery_lines: (OP_MYSTERY_LINES, ('spiral_rate', 'frequency'), {}),
+    standard_transforms.translate_scale_rotate_transform: (OP_TRANSLATE_SCALE_ROTATE,
+                                                           ('x_offset', 'y_offset', 'scale_x', 'scale_y',
+                                                            'rotation_angle'), {}),
+    spirograph_transforms.spirograph_transform: (OP_SPIROGRAPH, ('R', 'r', 'd', 'mode'),
+                                                 {'mode': spirograph_transforms.TROCHOID_SIGNS}),
+    spirograph_transforms.elliptical_spirograph_transform: (OP_ELLIPTICAL_SPIROGRAPH,
+                                                            ('R', 'r', 'd', 'a', 'b', 'mode'),
+                                                            {'mode': spirograph_transforms.TROCHOID_SIGNS}),
+    spirograph_transforms.polygon_spirograph_transform: (OP_POLYGON_SPIROGRAPH, ('R', 'n', 'd', 'mode'),
+                                                         {'mode': spirograph_transforms.CYCLOGON_SIGNS}),
+    spirograph_transforms.spirograph_rectangle_transform: (OP_SPIROGRAPH_RECTANGLE,
+                                                           ('rect_width', 'rect_height', 'gear_radius',
+                                                            'tracing_point_dist'), {}),
+}
+
+MAX_PARAMS = max(len(names) for _, names, _ in FUSED_OPS.values())
+
+
+def lower_transform(transform_func, args, kwargs):
+    """
+    Lowers a transform function and its pattern parameters to a fused kernel op.
+    :param transform_func: The transform function.
+    :param args: Positional pattern parameters (after x, y, theta).
+    :param kwargs: Keyword pattern parameters.
+    :return: (op_id, params), where params is a MAX_PARAMS long float64 array,
+             or (OP_PYTHON, None) if the transform has to run as a Python function.
+    """
+    if transform_func not in FUSED_OPS:
+        return OP_PYTHON, None
+    op_id, names, codes = FUSED_OPS[transform_func]
+    bound = signature(transform_func).bind(None, None, None, *args, **kwargs)
+    bound.apply_defaults()
+
+    params = np.zeros(MAX_PARAMS)
+    for k, name in enumerate(names):
+        value = bound.arguments[name]
+        if isinstance(value, str):
+            if value not in codes.get(name, {}):
+                return OP_PYTHON, None
+            value = codes[name][value]
+        elif callable(value):
+            return OP_PYTHON, None
+        params[k] = value
+    return op_id, params
+
+
+def make_transform(transform_func, args, kwargs):
+    """
+    Binds pattern parameters to a transform function, lowering it for the fused pipeline once
+    up front rather than on every draw.
+    :param transform_func: The transform function.
+    :param args: Positional pattern parameters (after x, y, theta).
+    :param kwargs: Keyword pattern parameters.
+    :return: A Transform record.
+    """
+    op_id, params = lower_transform(transform_func, args, kwargs)
+    return Transform(transform_func, args, kwargs, op_id, params)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def apply_pipeline(theta, theta_max, op_ids, params, x_in, y_in, x_out, y_out):
+    # Runs every op for one point before moving on to the next, so no stage materializes arrays
+    for i in prange(theta.shape[0]):
+        t = theta[i]
+        x = x_in[i]
+        y = y_in[i]
+        cos_t = math.cos(t)
+        sin_t = math.sin(t)
+        progress = t / theta_max
+
+        for k in range(op_ids.shape[0]):
+            op = op_ids[k]
+            p = params[k]
+            if op == OP_SPIRAL:
+                r = 1 + p[0] * t
+                x += p[1] * r * cos_t
+                y += p[2] * r * sin_t
+            elif op == OP_SPIRAL_OSCILLATOR:
+                r = p[0] + p[0] * math.sin(p[1] * t) + p[2]
+                x += p[3] * r * cos_t
+                y += p[4] * r * sin_t
+            elif op == OP_VARIABLE_SPIRAL:
+                r = (p[0] + ((p[1] - p[0]) / (2 * theta_max)) * t) * t
+                x += p[2] * r * cos_t
+                y += p[3] * r * sin_t
+            elif op == OP_CIRCULAR_MOTION:
+                x += p[0] * math.cos(p[1] * t)
+                y += p[0] * math.sin(p[1] * t)
+            elif op == OP_PAPER_ROTATION or op == OP_PAPER_ROTATION_NON_LINEAR:
+                if op == OP_PAPER_ROTATION or p[1] == 0:
+                    phi = progress
+                elif p[1] == 1:
+                    phi = progress * progress
+                else:
+                    phi = math.sin(progress * np.pi / 2)
+                phi *= p[0] * np.pi / 180
+                cos_phi = math.cos(phi)
+                sin_phi = math.sin(phi)
+                x, y = x * cos_phi - y * sin_phi, x * sin_phi + y * cos_phi
+            elif op == OP_LINEAR_TRANSLATION:
+                movement_angle = p[1] * np.pi / 180
+                x += progress * p[0] * math.cos(movement_angle)
+                y += progress * p[0] * math.sin(movement_angle)
+            elif op == OP_MYSTERY_LINES:
+                r = p[0] + p[0] * math.sin(p[1] * t)
+                x += r * cos_t
+                y += r * sin_t
+            elif op == OP_TRANSLATE_SCALE_ROTATE:
+                x_scaled = x * p[2]
+                y_scaled = y * p[3]
+                if p[4] == 0:
+                    x = x_scaled + p[0]
+                    y = y_scaled + p[1]
+                else:
+                    rotation_radians = p[4] * np.pi / 180
+                    cos_rot = math.cos(rotation_radians)
+                    sin_rot = math.sin(rotation_radians)
+                    x = x_scaled * cos_rot - y_scaled * sin_rot + p[0]
+                    y = x_scaled * sin_rot + y_scaled * cos_rot + p[1]
+            elif op == OP_SPIROGRAPH or op == OP_ELLIPTICAL_SPIROGRAPH:
+                big_r = p[0]
+                small_r = p[1]
+                d = p[2]
+                if op == OP_SPIROGRAPH:
+                    sign = p[3]
+                    d_x = d
+                    d_y = d
+                else:
+                    sign = p[5]
+                    d_x = d * (p[3] / small_r)
+                    d_y = d * (p[4] / small_r)
+                centre = big_r + sign * small_r
+                inner = (centre / small_r) * t
+                x += centre * cos_t - sign * d_x * math.cos(inner)
+                y += centre * sin_t - d_y * math.sin(inner)
+            elif op == OP_POLYGON_SPIROGRAPH:
+                big_r = p[0]
+                n = p[1]
+                s = math.sin(np.pi / n)
+                small_r = big_r * (s / (1 - p[3] * s))
+                centre = big_r + p[3] * small_r
+                phi = (centre / small_r) * (1 - 2 * np.pi / n) * t
+                x += centre * cos_t + p[2] * math.cos(phi)
+                y += centre * sin_t + p[2] * math.sin(phi)
+            elif op == OP_SPIROGRAPH_RECTANGLE:
+                rect_width = p[0]
+                rect_height = p[1]
+                gear_radius = p[2]
+                distance = (gear_radius * t) % (2 * (rect_width + rect_height))
+                if distance < rect_width:  # Top side
+                    gear_center_x = -rect_width / 2 + distance
+                    gear_center_y = rect_height / 2
+                elif distance < rect_width + rect_height:  # Right side
+                    gear_center_x = rect_width / 2
+                    gear_center_y = rect_height / 2 - (distance - rect_width)
+                elif distance < 2 * rect_width + rect_height:  # Bottom side
+                    gear_center_x = rect_width / 2 - (distance - (rect_width + rect_height))
+                    gear_center_y = -rect_height / 2
+                else:  # Left side
+                    gear_center_x = -rect_width / 2
+                    gear_center_y = -rect_height / 2 + (distance - (2 * rect_width + rect_height))
+                gear_rotation = t * (rect_width + rect_height) / gear_radius
+                x += gear_center_x + p[3] * math.cos(gear_rotation)
+                y += gear_center_y + p[3] * math.sin(gear_rotation)
+
+        x_out[i] = x
+        y_out[i] = y
+
+
+def _run_fused(ops, x, y, theta, theta_max, out=None):
+    if not ops:
+        return x, y
+    op_ids = np.array([op.op_id for op in ops], dtype=np.int32)
+    params = np.stack([op.params for op in ops])
+
+    # Scalar starting points become zero-stride views rather than filled arrays, in the result dtype
+    dtype = np.result_type(x, y, theta)
+    x = np.broadcast_to(np.asarray(x, dtype=dtype), theta.shape)
+    y = np.broadcast_to(np.asarray(y, dtype=dtype), theta.shape)
+
+    x_out, y_out = (np.empty(theta.shape, dtype), np.empty(theta.shape, dtype)) if out is None else out
+    apply_pipeline(theta, theta_max, op_ids, params, x, y, x_out, y_out)
+    return x_out, y_out
+
+
+def apply_transforms(transforms, x, y, theta, theta_max=None):
+    """
+    Applies a list of transforms in order. With numba available, each run of consecutive fusable
+    transforms is evaluated in a single pass over theta instead of one array pass per stage.
+    :param transforms: List of Transform records.
+    :param x: Original x coordinates (array, or a scalar starting point for every theta)
+    :param y: Original y coordinates (array, or a scalar starting point for every theta)
+    :param theta: Angle values
+    :param theta_max: Final angle of the pattern, e.g. 2 * pi * rotations (defaults to theta[-1])
+    :return: Transformed x and y coordinates
+    """
+    theta_max = float(theta[-1]) if theta_max is None else theta_max
+
+    # cos/sin of theta are only computed once a transform on the Python path asks for them
+    context = {'theta_max': theta_max}
+
+    # Two (2, N) buffers the stages take turns writing into, so a chain of transforms allocates
+    # its outputs once rather than once per stage
+    buffers = [None, None]
+    dtype = np.result_type(x, y, theta)
+
+    ops = []
+    for transform_func in transforms:
+        if HAVE_NUMBA and transform_func.op_id != OP_PYTHON:
+            ops.append(transform_func)
+        else:
+            if ops:
+                x, y = _run_fused(ops, x, y, theta, theta_max, _free_buffer(buffers, x, y, theta.shape, dtype))
+                ops = []
+            if 'cos_theta' not in context and 'cos_theta' in context_params(transform_func.func):
+                context = theta_context(theta, theta_max)
+            out = _free_buffer(buffers, x, y, theta.shape, dtype) if accepts_out(transform_func.func) else None
+            points = _held_points(buffers, x, y)
+            if transform_func.func is standard_transforms.translate_scale_rotate_transform and points is not None:
+                # The coordinates already sit in one (2, N) buffer, so scale and rotate them as a single
+                # matrix product rather than row by row
+                x, y = standard_transforms.translate_scale_rotate_points(points, *transform_func.args,
+                                                                         **transform_func.kwargs, out=out)
+            else:
+                x, y = transform_func(x, y, theta, context, out)
+    if not ops:
+        return x, y
+    return _run_fused(ops, x, y, theta, theta_max, _free_buffer(buffers, x, y, theta.shape, dtype))
+
+
+def _free_buffer(buffers, x, y, shape, dtype):
+    """
+    :param buffers: The pipeline's two ping-pong buffers; None until first used.
+    :param x: Current x coordinates
+    :param y: Current y coordinates
+    :param shape: Shape of the coordinate arrays
+    :param dtype: dtype of the coordinate arrays
+    :return: Whichever of the two (2, N) buffers doesn't hold x or y, allocating it on first use
+    """
+    for k in range(len(buffers)):
+        if buffers[k] is None:
+            buffers[k] = np.empty((2,) + shape, dtype)
+        if not (np.may_share_memory(buffers[k], x) or np.may_share_memory(buffers[k], y)):
+            return buffers[k]
+    raise ValueError("x and y are held by both pipeline buffers")
+
+
+def _held_points(buffers, x, y):
+    """
+    :param buffers: The pipeline's two ping-pong buffers; None until first used.
+    :param x: Current x coordinates
+    :param y: Current y coordinates
+    :return: The (2, N) buffer whose rows are exactly x and y, or None if they aren't held by one
+    """
+    for points in buffers:
+        if (points is not None and isinstance(x, np.ndarray) and isinstance(y, np.ndarray)
+                and x.base is points and y.base is points and x.shape == y.shape == points.shape[1:]
+                and x.ctypes.data == points[0].ctypes.data and y.ctypes.data == points[1].ctypes.data):
+            return points
+    return None
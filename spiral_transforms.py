@@ -1,7 +1,15 @@
 import numpy as np
 
+from accelerators import HAVE_NUMBA, HAVE_NUMEXPR, njit, numexpr_evaluate, prange, sincos
 
-def spiral_transform(x, y, theta, spiral_rate, a=1, b=1):
+try:
+    # Ahead-of-time compiled kernels, built by spiral_transforms_aot.py
+    import spiral_kernels
+except ImportError:
+    spiral_kernels = None
+
+
+def spiral_transform(x, y, theta, spiral_rate, a=1, b=1, cos_theta=None, sin_theta=None, out=None):
     """
     Transforms the drawing coordinates to create a spiral effect based on an ellipse.
     :param x: Original x coordinates
@@ -10,15 +18,27 @@ def spiral_transform(x, y, theta, spiral_rate, a=1, b=1):
     :param spiral_rate: Rate at which the spiral grows or shrinks
     :param a: Semi-major axis of the ellipse (default is 1 for a circle)
     :param b: Semi-minor axis of the ellipse (default is 1 for a circle)
+    :param cos_theta: Optional precomputed np.cos(theta)
+    :param sin_theta: Optional precomputed np.sin(theta)
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates
     """
+    if cos_theta is None or sin_theta is None:
+        sin_theta, cos_theta = sincos(theta)
+
+    x_out, y_out = (None, None) if out is None else out
+    if HAVE_NUMEXPR:
+        x_transformed = numexpr_evaluate("x + a * (1 + spiral_rate * theta) * cos_theta", theta, out=x_out,
+                                         x=x, a=a, spiral_rate=spiral_rate, cos_theta=cos_theta)
+        y_transformed = numexpr_evaluate("y + b * (1 + spiral_rate * theta) * sin_theta", theta, out=y_out,
+                                         y=y, b=b, spiral_rate=spiral_rate, sin_theta=sin_theta)
+        return x_transformed, y_transformed
 
     r = 1 + spiral_rate * theta  # Radial distance grows with theta
-    x_transformed = x + a * r * np.cos(theta)
-    y_transformed = y + b * r * np.sin(theta)
-    return x_transformed, y_transformed
+    return _add_elliptical(x, y, r, a, b, cos_theta, sin_theta, x_out, y_out)
 
-def spiral_oscillator(x, y, theta, spiral_rate, frequency, const=0, a=1, b=1):
+def spiral_oscillator(x, y, theta, spiral_rate, frequency, const=0, a=1, b=1, cos_theta=None, sin_theta=None,
+                      out=None):
     """
     Transforms the drawing coordinates to create a spiral that spirals in and out multiple times.
     Each in-and-out spiral constitutes a single cycle.
@@ -34,9 +54,16 @@ def spiral_oscillator(x, y, theta, spiral_rate, frequency, const=0, a=1, b=1):
                       Determines the total angle span of theta.
     :param a: Semi-major axis of the ellipse (default is 1 for a circle).
     :param b: Semi-minor axis of the ellipse (default is 1 for a circle).
+    :param cos_theta: Optional precomputed np.cos(theta) (array).
+    :param sin_theta: Optional precomputed np.sin(theta) (array).
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y).
 
     :return: Transformed x and y coordinates (arrays)
     """
+    if cos_theta is None or sin_theta is None:
+        sin_theta, cos_theta = sincos(theta)
+    x_out, y_out = (None, None) if out is None else out
+
     # Calculate the frequency of the oscillation based on cycles and rotations
     # frequency = cycles / rotations  # Oscillations per full rotation
 
@@ -44,14 +71,26 @@ def spiral_oscillator(x, y, theta, spiral_rate, frequency, const=0, a=1, b=1):
     # r(theta) oscillates between (spiral_rate - amplitude) and (spiral_rate + amplitude)
     # To ensure r remains positive, spiral_rate should be >= amplitude
     amplitude = spiral_rate  # Fixed amplitude for even spiraling
-    r = spiral_rate + amplitude * np.sin(frequency * theta)
-    # Apply the spiral transformation
-    x_transformed = x + a * (r + const) * np.cos(theta)
-    y_transformed = y + b * (r + const) * np.sin(theta)
-
-    return x_transformed, y_transformed
-
-def variable_spiral_transform(x, y, theta, start_rate, end_rate, a=1, b=1):
+    if HAVE_NUMEXPR:
+        r_const = numexpr_evaluate("spiral_rate + amplitude * sin(frequency * theta) + const", theta,
+                                   spiral_rate=spiral_rate, amplitude=amplitude, frequency=frequency, const=const)
+        x_transformed = numexpr_evaluate("x + a * r_const * cos_theta", theta, out=x_out, x=x, a=a,
+                                         r_const=r_const, cos_theta=cos_theta)
+        y_transformed = numexpr_evaluate("y + b * r_const * sin_theta", theta, out=y_out, y=y, b=b,
+                                         r_const=r_const, sin_theta=sin_theta)
+        return x_transformed, y_transformed
+
+    # Build r + const in a single buffer, folding const into the base rate
+    r_const = np.multiply(frequency, theta)
+    np.sin(r_const, out=r_const)
+    r_const *= amplitude
+    r_const += spiral_rate + const
+
+    # Apply the spiral transformation, again reusing each output buffer for the intermediate products
+    return _add_elliptical(x, y, r_const, a, b, cos_theta, sin_theta, x_out, y_out)
+
+def variable_spiral_transform(x, y, theta, start_rate, end_rate, a=1, b=1, cos_theta=None, sin_theta=None,
+                              theta_max=None, out=None):
     """
     Transforms the drawing coordinates to create a spiral effect with a variable spiral rate based on an ellipsoid.
     :param x: Original x coordinates
@@ -61,19 +100,35 @@ def variable_spiral_transform(x, y, theta, start_rate, end_rate, a=1, b=1):
     :param end_rate: Ending rate of the spiral at theta = theta_max
     :param a: Semi-major axis of the ellipse (default is 1 for a circle)
     :param b: Semi-minor axis of the ellipse (default is 1 for a circle)
+    :param cos_theta: Optional precomputed np.cos(theta)
+    :param sin_theta: Optional precomputed np.sin(theta)
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1])
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates
     """
-    theta_max = theta[-1]
+    if cos_theta is None or sin_theta is None:
+        sin_theta, cos_theta = sincos(theta)
+
+    x_out, y_out = (None, None) if out is None else out
+    theta_max = theta[-1] if theta_max is None else theta_max
     delta_rate = end_rate - start_rate
-    # Compute the cumulative radial distance r(θ)
-    r = start_rate * theta + (delta_rate / (2 * theta_max)) * theta ** 2
+    # Compute the cumulative radial distance r(θ) = start_rate·θ + (Δrate / 2θmax)·θ², in Horner form
+    if HAVE_NUMEXPR:
+        r = numexpr_evaluate("(start_rate + rate_coeff * theta) * theta", theta,
+                             start_rate=start_rate, rate_coeff=delta_rate / (2 * theta_max))
+        x_transformed = numexpr_evaluate("x + a * r * cos_theta", theta, out=x_out, x=x, a=a, r=r,
+                                         cos_theta=cos_theta)
+        y_transformed = numexpr_evaluate("y + b * r * sin_theta", theta, out=y_out, y=y, b=b, r=r,
+                                         sin_theta=sin_theta)
+        return x_transformed, y_transformed
+
+    r = (start_rate + (delta_rate / (2 * theta_max)) * theta) * theta
     # Update the coordinates with ellipsoidal scaling
-    x_transformed = x + a * r * np.cos(theta)
-    y_transformed = y + b * r * np.sin(theta)
-    return x_transformed, y_transformed
+    return _add_elliptical(x, y, r, a, b, cos_theta, sin_theta, x_out, y_out)
 
 
-def variable_spiral_triangle_transform(x, y, theta, start_rate, end_rate, side1=1, side2=1, side3=1):
+def variable_spiral_triangle_transform(x, y, theta, start_rate, end_rate, side1=1, side2=1, side3=1, theta_max=None,
+                                       out=None):
     """
     Transforms the drawing coordinates to create a spiral effect with a variable spiral rate inside a triangle.
     :param x: Original x coordinates
@@ -84,6 +139,8 @@ def variable_spiral_triangle_transform(x, y, theta, start_rate, end_rate, side1=
     :param side1: Length of the first side of the triangle (between vertex1 and vertex2)
     :param side2: Length of the second side of the triangle (between vertex2 and vertex3)
     :param side3: Length of the third side of the triangle (between vertex3 and vertex1)
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1])
+    :param out: Optional (x, y) pair of arrays in theta's dtype to write the result into
     :return: Transformed x and y coordinates
     """
     # Define the vertices of the triangle based on side lengths
@@ -91,59 +148,18 @@ def variable_spiral_triangle_transform(x, y, theta, start_rate, end_rate, side1=
     vertex2 = np.array([-side1 * np.sqrt(3)/2, -0.5 * side1])  # Bottom-left vertex
     vertex3 = np.array([side3 * np.sqrt(3)/2, -0.5 * side3])  # Bottom-right vertex
 
-    theta_max = theta[-1]
-    delta_rate = end_rate - start_rate
-
-    # Compute the cumulative radial distance r(θ)
-    r = start_rate * theta + (delta_rate / (2 * theta_max)) * theta ** 2
-
-    # Initialize transformed coordinates
-    x_transformed = np.zeros_like(x)
-    y_transformed = np.zeros_like(y)
-
-    for i, angle in enumerate(theta):
-        # Normalize the angle to be in the range [0, 2π]
-        norm_angle = angle % (2 * np.pi)
-
-        if norm_angle < 2 * np.pi / 3:  # First side of the triangle
-            t = norm_angle / (2 * np.pi / 3)
-            x_transformed[i] = (1 - t) * vertex1[0] + t * vertex2[0]
-            y_transformed[i] = (1 - t) * vertex1[1] + t * vertex2[1]
-        elif norm_angle < 4 * np.pi / 3:  # Second side of the triangle
-            t = (norm_angle - 2 * np.pi / 3) / (2 * np.pi / 3)
-            x_transformed[i] = (1 - t) * vertex2[0] + t * vertex3[0]
-            y_transformed[i] = (1 - t) * vertex2[1] + t * vertex3[1]
-        else:  # Third side of the triangle
-            t = (norm_angle - 4 * np.pi / 3) / (2 * np.pi / 3)
-            x_transformed[i] = (1 - t) * vertex3[0] + t * vertex1[0]
-            y_transformed[i] = (1 - t) * vertex3[1] + t * vertex1[1]
-
-        # Scale by the radial distance r
-        x_transformed[i] = r[i] * x_transformed[i]
-        y_transformed[i] = r[i] * y_transformed[i]
-
-    return x_transformed, y_transformed
+    return _polygon_spiral(theta, start_rate, end_rate, np.array([vertex1, vertex2, vertex3]), theta_max, out)
 
 
 
-def variable_spiral_regular_ngon_transform(x, y, theta, start_rate, end_rate, side_lengths):
+def build_ngon_vertices(side_lengths):
     """
-    Transforms the drawing coordinates to create a spiral effect with a variable spiral rate inside an n-gon.
-
-    :param x: Original x coordinates
-    :param y: Original y coordinates
-    :param theta: Angle values
-    :param start_rate: Starting rate of the spiral at theta = 0
-    :param end_rate: Ending rate of the spiral at theta = theta_max
+    Builds the vertices of an n-gon from its side lengths. The geometry only depends on the
+    side lengths, so patterns can build it once and use variable_spiral_ngon_apply.
     :param side_lengths: List of side lengths for the n-gon
-    :return: Transformed x and y coordinates
+    :return: (n, 2) array of vertices, starting at (0, 1)
     """
     n = len(side_lengths)
-    theta_max = theta[-1]
-    delta_rate = end_rate - start_rate
-
-    # Compute the cumulative radial distance r(θ)
-    r = start_rate * theta + (delta_rate / (2 * theta_max)) * theta ** 2
 
     # Define the vertices of the n-gon based on side lengths and the geometry of the polygon
     vertices = []
@@ -172,38 +188,46 @@ def variable_spiral_regular_ngon_transform(x, y, theta, start_rate, end_rate, si
         vertices.append(next_vertex)
         current_vertex = next_vertex
 
-    vertices = np.array(vertices)
-
-    # Initialize transformed coordinates
-    x_transformed = np.zeros_like(x)
-    y_transformed = np.zeros_like(y)
+    return np.array(vertices)
 
-    for i, angle in enumerate(theta):
-        # Normalize the angle to be in the range [0, 2π]
-        norm_angle = angle % (2 * np.pi)
-        segment_angle = 2 * np.pi / n  # Angle per polygon segment
 
-        # Find which side of the n-gon the point is on
-        side_index = int(norm_angle // segment_angle)
-        t = (norm_angle % segment_angle) / segment_angle
+def variable_spiral_ngon_apply(x, y, theta, start_rate, end_rate, vertices, theta_max=None, out=None):
+    """
+    Transforms the drawing coordinates to create a spiral effect with a variable spiral rate inside an n-gon
+    whose vertices were built ahead of time (see build_ngon_vertices).
 
-        # Get the start and end points of the current side
-        vertex_start = vertices[side_index]
-        vertex_end = vertices[(side_index + 1) % n]  # Use modulo n to wrap around
+    :param x: Original x coordinates
+    :param y: Original y coordinates
+    :param theta: Angle values
+    :param start_rate: Starting rate of the spiral at theta = 0
+    :param end_rate: Ending rate of the spiral at theta = theta_max
+    :param vertices: (n, 2) array of n-gon vertices, in drawing order
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1])
+    :param out: Optional (x, y) pair of arrays in theta's dtype to write the result into
+    :return: Transformed x and y coordinates
+    """
+    return _polygon_spiral(theta, start_rate, end_rate, vertices, theta_max, out)
 
-        # Linearly interpolate along the side of the polygon
-        x_transformed[i] = (1 - t) * vertex_start[0] + t * vertex_end[0]
-        y_transformed[i] = (1 - t) * vertex_start[1] + t * vertex_end[1]
 
-        # Scale by the radial distance r
-        x_transformed[i] *= r[i]
-        y_transformed[i] *= r[i]
+def variable_spiral_regular_ngon_transform(x, y, theta, start_rate, end_rate, side_lengths, theta_max=None, out=None):
+    """
+    Transforms the drawing coordinates to create a spiral effect with a variable spiral rate inside an n-gon.
 
-    return x_transformed, y_transformed
+    :param x: Original x coordinates
+    :param y: Original y coordinates
+    :param theta: Angle values
+    :param start_rate: Starting rate of the spiral at theta = 0
+    :param end_rate: Ending rate of the spiral at theta = theta_max
+    :param side_lengths: List of side lengths for the n-gon
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1])
+    :param out: Optional (x, y) pair of arrays in theta's dtype to write the result into
+    :return: Transformed x and y coordinates
+    """
+    return _polygon_spiral(theta, start_rate, end_rate, build_ngon_vertices(side_lengths), theta_max, out)
 
 
 #  Not working - it can't calculate side lengths correctly
-def variable_spiral_ngon_transform(x, y, theta, start_rate, end_rate, side_lengths):
+def variable_spiral_ngon_transform(x, y, theta, start_rate, end_rate, side_lengths, theta_max=None, out=None):
     """
     Transforms the drawing coordinates to create a spiral effect with a variable spiral rate inside an n-gon.
 
@@ -213,68 +237,113 @@ def variable_spiral_ngon_transform(x, y, theta, start_rate, end_rate, side_lengt
     :param start_rate: Starting rate of the spiral at theta = 0
     :param end_rate: Ending rate of the spiral at theta = theta_max
     :param side_lengths: List of side lengths for the n-gon
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1])
+    :param out: Optional (x, y) pair of arrays in theta's dtype to write the result into
     :return: Transformed x and y coordinates
     """
     print("WARNING - this isn't working properly, it can't calc side lengths right")
-    n = len(side_lengths)
-    theta_max = theta[-1]
-    delta_rate = end_rate - start_rate
-
-    # Compute the cumulative radial distance r(θ)
-    r = start_rate * theta + (delta_rate / (2 * theta_max)) * theta ** 2
-
-    # Define the vertices of the n-gon based on side lengths and the geometry of the polygon
-    vertices = []
-
-    # Place the first vertex at (0, 1)
-    current_vertex = np.array([0, 1])
-    vertices.append(current_vertex)
-
-    current_angle = np.pi / 2  # Start pointing straight up from (0, 1)
-
-    for i in range(1, n):
-        # The previous side length and next side length
-        side_a = side_lengths[i - 1]
-        side_b = side_lengths[i]
-        side_c = side_lengths[(i + 1) % n]  # Closing side
+    return _polygon_spiral(theta, start_rate, end_rate, build_ngon_vertices(side_lengths), theta_max, out)
 
-        # Using the law of cosines to calculate the angle between sides
-        cos_angle = (side_a ** 2 + side_b ** 2 - side_c ** 2) / (2 * side_a * side_b)
-        internal_angle = np.arccos(np.clip(cos_angle, -1, 1))  # Clip to handle floating point errors
 
-        # Update the angle to the new direction
-        current_angle -= internal_angle
-
-        # Calculate the next vertex
-        next_vertex = current_vertex + side_b * np.array([np.cos(current_angle), np.sin(current_angle)])
-        vertices.append(next_vertex)
-        current_vertex = next_vertex
-
-    vertices = np.array(vertices)
-
-    # Initialize transformed coordinates
-    x_transformed = np.zeros_like(x)
-    y_transformed = np.zeros_like(y)
-
-    for i, angle in enumerate(theta):
-        # Normalize the angle to be in the range [0, 2π]
+def _aot_kernel(name, theta):
+    """
+    :param name: Name of the exported kernel in spiral_kernels.
+    :param theta: Angle values; selects the export for theta's dtype.
+    :return: The ahead-of-time compiled kernel, or None if spiral_kernels hasn't been built.
+    """
+    if spiral_kernels is None:
+        return None
+    return getattr(spiral_kernels, '{}_{}'.format(name, theta.dtype.str[1:]), None)
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _polygon_spiral_kernel(theta, start_rate, rate_coeff, vertices, edges, out_x, out_y):
+    # Scalar form of _polygon_spiral
+    n = vertices.shape[0]
+    segment_angle = 2 * np.pi / n
+    for i in prange(theta.shape[0]):
+        angle = theta[i]
         norm_angle = angle % (2 * np.pi)
-        segment_angle = 2 * np.pi / n  # Angle per polygon segment
+        side_index = min(int(norm_angle / segment_angle), n - 1)
+        t = (norm_angle - side_index * segment_angle) / segment_angle
+        r = (start_rate + rate_coeff * angle) * angle
+        out_x[i] = r * (vertices[side_index, 0] + t * edges[side_index, 0])
+        out_y[i] = r * (vertices[side_index, 1] + t * edges[side_index, 1])
 
-        # Find which side of the n-gon the point is on
-        side_index = int(norm_angle // segment_angle)
-        t = (norm_angle % segment_angle) / segment_angle
 
-        # Get the start and end points of the current side
-        vertex_start = vertices[side_index]
-        vertex_end = vertices[(side_index + 1) % n]  # Use modulo n to wrap around
+def _polygon_spiral(theta, start_rate, end_rate, vertices, theta_max=None, out=None):
+    """
+    Walks the polygon outline once per turn of theta, scaled by a variable spiral rate.
+    :param theta: Angle values
+    :param start_rate: Starting rate of the spiral at theta = 0
+    :param end_rate: Ending rate of the spiral at theta = theta_max
+    :param vertices: (n, 2) array of polygon vertices, in drawing order
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1])
+    :param out: Optional (x, y) pair of arrays in theta's dtype to write the result into
+    :return: Transformed x and y coordinates
+    """
+    n = len(vertices)
+    theta_max = theta[-1] if theta_max is None else theta_max
+    delta_rate = end_rate - start_rate
+    rate_coeff = delta_rate / (2 * theta_max)
+
+    # Side i runs from vertices[i] along edges[i] (wrapping back to the first vertex),
+    # so a point on it is just start + t * edge
+    vertices = np.asarray(vertices, dtype=theta.dtype)
+    edges = np.roll(vertices, -1, axis=0) - vertices
+
+    kernel = _aot_kernel('polygon_spiral_kernel', theta)
+    if kernel is None and HAVE_NUMBA:
+        kernel = _polygon_spiral_kernel
+    if kernel is not None:
+        x_transformed, y_transformed = (np.empty_like(theta), np.empty_like(theta)) if out is None else out
+        kernel(theta, start_rate, rate_coeff, vertices, edges, x_transformed, y_transformed)
+        return x_transformed, y_transformed
+
+    # Normalize the angle to be in the range [0, 2π]
+    norm_angle = np.mod(theta, 2 * np.pi)
+    segment_angle = 2 * np.pi / n  # Angle per polygon segment
+
+    # Find which side of the polygon each point is on
+    # (kept in theta's dtype; mixing in the integer index would promote t to float64)
+    side_position = norm_angle / segment_angle
+    side_start = np.minimum(np.floor(side_position), n - 1)
+    t = side_position - side_start
+    side_index = side_start.astype(np.intp)
+
+    # Compute the cumulative radial distance r(θ), in Horner form
+    r = (start_rate + rate_coeff * theta) * theta
+
+    # Interpolate along the side and scale by r in place, without extra full-size temporaries
+    x_out, y_out = (None, None) if out is None else out
+    x_transformed = np.multiply(edges[side_index, 0], t, out=x_out)
+    x_transformed += vertices[side_index, 0]
+    x_transformed *= r
+    y_transformed = np.multiply(edges[side_index, 1], t, out=y_out)
+    y_transformed += vertices[side_index, 1]
+    y_transformed *= r
 
-        # Linearly interpolate along the side of the polygon
-        x_transformed[i] = (1 - t) * vertex_start[0] + t * vertex_end[0]
-        y_transformed[i] = (1 - t) * vertex_start[1] + t * vertex_end[1]
+    return x_transformed, y_transformed
 
-        # Scale by the radial distance r
-        x_transformed[i] *= r[i]
-        y_transformed[i] *= r[i]
 
+def _add_elliptical(x, y, r, a, b, cos_theta, sin_theta, x_out=None, y_out=None):
+    """
+    Computes x + a * r * cos_theta and y + b * r * sin_theta, building each result in its output buffer.
+    :param x: Original x coordinates
+    :param y: Original y coordinates
+    :param r: Radial distance of each point
+    :param a: Scale of the x offsets
+    :param b: Scale of the y offsets
+    :param cos_theta: np.cos(theta)
+    :param sin_theta: np.sin(theta)
+    :param x_out: Optional array to write the x coordinates into
+    :param y_out: Optional array to write the y coordinates into
+    :return: Transformed x and y coordinates
+    """
+    x_transformed = np.multiply(r, cos_theta, out=x_out)
+    x_transformed *= a
+    x_transformed += x
+    y_transformed = np.multiply(r, sin_theta, out=y_out)
+    y_transformed *= b
+    y_transformed += y
     return x_transformed, y_transformed
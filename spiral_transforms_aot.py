@@ -0,0 +1,22 @@
+"""
+Ahead-of-time build of the numba kernels in spiral_transforms.
+
+Run ``python spiral_transforms_aot.py`` once (numba is needed for the build only) to produce the
+``spiral_kernels`` extension module next to this file. spiral_transforms picks it up when present,
+which skips the JIT compile on the first call; the extension itself doesn't need numba at runtime.
+"""
+from numba.pycc import CC
+
+from spiral_transforms import _polygon_spiral_kernel
+
+cc = CC('spiral_kernels')
+
+# One export per coordinate dtype, named <kernel>_<dtype> (see _aot_kernel in spiral_transforms)
+for dtype in ('f8', 'f4'):
+    cc.export('polygon_spiral_kernel_' + dtype,
+              'void({0}[:], f8, f8, {0}[:, :], {0}[:, :], {0}[:], {0}[:])'.format(dtype))(
+        _polygon_spiral_kernel.py_func)
+
+
+if __name__ == "__main__":
+    cc.compile()
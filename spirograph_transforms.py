@@ -1,59 +1,15 @@
-import numpy as np
-
-def elliptical_spirograph_transform(x, y, theta, R, r, d, a, b, mode):
-    """
-    Generates a spirograph pattern with an ellipse as the rolling element.
-    :param x: Initial x coordinates (starting point array)
-    :param y: Initial y coordinates (starting point array)
-    :param theta: Array of angle values
-    :param R: Radius of the fixed circle
-    :param r: Characteristic 'radius' of the ellipse (can be average of a and b)
-    :param d: Distance from the center of the rolling ellipse to the drawing point
-    :param a: Semi-major axis of the ellipse
-    :param b: Semi-minor axis of the ellipse
-    :param mode: Type of spirograph ('hypotrochoid' or 'epitrochoid')
-    :return: Transformed x and y coordinates (spirograph pattern)
-    """
-    if mode == 'hypotrochoid':
-        x_transformed = x + (R - r) * np.cos(theta) + d * (a / r) * np.cos(((R - r) / r) * theta)
-        y_transformed = y + (R - r) * np.sin(theta) - d * (b / r) * np.sin(((R - r) / r) * theta)
-    elif mode == 'epitrochoid':
-        x_transformed = x + (R + r) * np.cos(theta) - d * (a / r) * np.cos(((R + r) / r) * theta)
-        y_transformed = y + (R + r) * np.sin(theta) - d * (b / r) * np.sin(((R + r) / r) * theta)
-    else:
-        raise ValueError("Invalid mode. Use 'hypotrochoid' or 'epitrochoid'.")
-    return x_transformed, y_transformed
-
-
-
-def spirograph_transform(x, y, theta, R, r, d, mode):
-    """
-    Generates spirograph pattern points from an initial point.
-    :param x: Initial x coordinate (starting point)
-    :param y: Initial y coordinate (starting point)
-    :param theta: Array of angle values
-    :param R: Radius of the fixed circle
-    :param r: Radius of the rolling circle
-    :param d: Distance from the center of the rolling circle to the drawing point
-    :param mode: Type of spirograph ('hypotrochoid' or 'epitrochoid')
-    :return: Transformed x and y coordinates (spirograph pattern)
-    """
-
-    if mode == 'hypotrochoid':
-        x_transformed = x + (R - r) * np.cos(theta) + d * np.cos(((R - r) / r) * theta)
-        y_transformed = y + (R - r) * np.sin(theta) - d * np.sin(((R - r) / r) * theta)
-    elif mode == 'epitrochoid':
-        x_transformed = x + (R + r) * np.cos(theta) - d * np.cos(((R + r) / r) * theta)
-        y_transformed = y + (R + r) * np.sin(theta) - d * np.sin(((R + r) / r) * theta)
-    else:
-        raise ValueError("Invalid mode. Use 'hypotrochoid' or 'epitrochoid'.")
-    return x_transformed, y_transformed
+import math
 
+import numpy as np
 
+from accelerators import PREFER_TRIG_KERNELS, njit, numexpr_evaluate, prefer_numexpr_trig, prange, sincos
 
+# Sign of the rolling radius in R ± r for each mode: the rolling element runs inside (-) or outside (+)
+TROCHOID_SIGNS = {'hypotrochoid': -1, 'epitrochoid': 1}
+CYCLOGON_SIGNS = {'hypocyclogon': -1, 'epicyclogon': 1}
 
 
-def polygon_spirograph_transform(x, y, theta, R, n, d, mode):
+def polygon_spirograph_transform(x, y, theta, R, n, d, mode, out=None):
     """
     Generates a spirograph pattern with a regular polygon as the rolling element.
     :param x: Initial x coordinates (starting point array)
@@ -63,50 +19,51 @@ def polygon_spirograph_transform(x, y, theta, R, n, d, mode):
     :param n: Number of sides of the rolling polygon (e.g., n=4 for a square)
     :param d: Distance from the center of the rolling polygon to the drawing point
     :param mode: Type of spirograph ('hypocyclogon' or 'epicyclogon')
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates (spirograph pattern)
     """
-    # Calculate the circumradius of the polygon
-    r = R * (np.sin(np.pi / n) / (1 + np.sin(np.pi / n))) if mode == 'hypocyclogon' else R * (
-                np.sin(np.pi / n) / (1 - np.sin(np.pi / n)))
-
-    if mode == 'hypocyclogon':
-        # Number of rotations the polygon makes
-        rotations = (R - r) / r
-        # Rotation angle of the polygon
-        psi = rotations * theta
-        # Angle to account for the orientation of the polygon
-        phi = (theta * (R - r) / r) - psi * (2 * np.pi / n)
-
-        # Position of the center of the polygon
-        xc = (R - r) * np.cos(theta)
-        yc = (R - r) * np.sin(theta)
-
-        # Position of the point on the polygon
-        x_transformed = x + xc + d * np.cos(phi)
-        y_transformed = y + yc + d * np.sin(phi)
-
-    elif mode == 'epicyclogon':
-        # Number of rotations the polygon makes
-        rotations = (R + r) / r
-        # Rotation angle of the polygon
-        psi = rotations * theta
-        # Angle to account for the orientation of the polygon
-        phi = (theta * (R + r) / r) - psi * (2 * np.pi / n)
-
-        # Position of the center of the polygon
-        xc = (R + r) * np.cos(theta)
-        yc = (R + r) * np.sin(theta)
-
-        # Position of the point on the polygon
-        x_transformed = x + xc + d * np.cos(phi)
-        y_transformed = y + yc + d * np.sin(phi)
-    else:
+    sign = CYCLOGON_SIGNS.get(mode)
+    if sign is None:
         raise ValueError("Invalid mode. Use 'hypocyclogon' or 'epicyclogon'.")
 
+    # Calculate the circumradius of the polygon
+    # (as a Python float: an np.float64 coefficient would upcast float32 theta)
+    side_sin = math.sin(math.pi / n)
+    r = R * (side_sin / (1 - sign * side_sin))
+
+    # Radius of the path traced by the polygon's center (R - r inside the circle, R + r outside)
+    center_radius = R + sign * r
+    # Number of rotations the polygon makes
+    rotations = center_radius / r
+    # The polygon's rotation angle is psi = rotations * theta, so the orientation angle
+    # phi = rotations * theta - psi * (2π / n) is a single multiple of theta
+    phi_coeff = rotations * (1 - 2 * np.pi / n)
+    x_out, y_out = (None, None) if out is None else out
+    if PREFER_TRIG_KERNELS:
+        return _trochoid(x, y, theta, center_radius, phi_coeff, d, d, x_out, y_out)
+    if prefer_numexpr_trig(theta.dtype):
+        return _trochoid_numexpr(x, y, theta, center_radius, phi_coeff, d, d, x_out, y_out)
+    phi = phi_coeff * theta
+
+    # Position of the center of the polygon
+    sin_theta, cos_theta = sincos(theta)
+    cos_theta *= center_radius
+    sin_theta *= center_radius
+
+    # Position of the point on the polygon
+    sin_phi, cos_phi = sincos(phi)
+    cos_phi *= d
+    sin_phi *= d
+    x_transformed = np.add(x, cos_theta, out=x_out)
+    x_transformed += cos_phi
+    y_transformed = np.add(y, sin_theta, out=y_out)
+    y_transformed += sin_phi
+
     return x_transformed, y_transformed
 
 
-def spirograph_rectangle_transform(x, y, theta, rect_width, rect_height, gear_radius, tracing_point_dist):
+def spirograph_rectangle_transform(x, y, theta, rect_width, rect_height, gear_radius, tracing_point_dist,
+                                   out=None):
     """
     Transforms the drawing coordinates to create a spirograph-like pattern where a gear rolls along
     the boundary of a skinny rectangle, and its centerpoint traces a rectangular path.
@@ -120,46 +77,61 @@ def spirograph_rectangle_transform(x, y, theta, rect_width, rect_height, gear_ra
     :param rect_height: Height of the rectangle
     :param gear_radius: Radius of the "gear" that is rolling along the rectangle
     :param tracing_point_dist: Distance of the tracing point from the center of the gear
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates (arrays)
     """
 
-    # Initialize transformed coordinates (make copies of x and y to modify)
-    x_transformed = np.copy(x)
-    y_transformed = np.copy(y)
-
     # The total distance the gear's center moves in one full loop around the rectangle
-    perimeter = 2 * (rect_width + rect_height)
-
-    # Iterate over theta to generate the spirograph pattern
-    for i, angle in enumerate(theta):
-        # Calculate how far along the perimeter the gear's center has moved
-        distance_along_perimeter = (gear_radius * angle) % perimeter
-
-        # Determine which side of the rectangle the center of the gear is moving along
-        if distance_along_perimeter < rect_width:  # Top side
-            gear_center_x = -rect_width / 2 + distance_along_perimeter
-            gear_center_y = rect_height / 2
-        elif distance_along_perimeter < rect_width + rect_height:  # Right side
-            gear_center_x = rect_width / 2
-            gear_center_y = rect_height / 2 - (distance_along_perimeter - rect_width)
-        elif distance_along_perimeter < 2 * rect_width + rect_height:  # Bottom side
-            gear_center_x = rect_width / 2 - (distance_along_perimeter - (rect_width + rect_height))
-            gear_center_y = -rect_height / 2
-        else:  # Left side
-            gear_center_x = -rect_width / 2
-            gear_center_y = -rect_height / 2 + (distance_along_perimeter - (2 * rect_width + rect_height))
-
-        # Calculate the rotation of the tracing point on the gear
-        gear_rotation = angle * (rect_width + rect_height) / gear_radius
-
-        # Update the transformed x and y coordinates with the tracing point, rotating around the gear's center
-        x_transformed[i] += gear_center_x + tracing_point_dist * np.cos(gear_rotation)
-        y_transformed[i] += gear_center_y + tracing_point_dist * np.sin(gear_rotation)
+    half_perimeter = rect_width + rect_height
+    perimeter = 2 * half_perimeter
+    half_width = rect_width * 0.5
+    half_height = rect_height * 0.5
+
+    # Calculate how far along the perimeter the gear's center has moved
+    distance_along_perimeter = np.mod(gear_radius * theta, perimeter)
+
+    # Determine which side of the rectangle the center of the gear is moving along:
+    # top, right, bottom, and otherwise the left side
+    sides = [
+        distance_along_perimeter < rect_width,
+        distance_along_perimeter < half_perimeter,
+        distance_along_perimeter < half_perimeter + rect_width,
+    ]
+    gear_center_x = np.select(sides, [
+        distance_along_perimeter - half_width,
+        half_width,
+        half_width - (distance_along_perimeter - half_perimeter),
+    ], default=-half_width)
+    gear_center_y = np.select(sides, [
+        half_height,
+        half_height - (distance_along_perimeter - rect_width),
+        -half_height,
+    ], default=-half_height + (distance_along_perimeter - (half_perimeter + rect_width)))
+
+    # Calculate the rotation of the tracing point on the gear
+    gear_rotation = theta * (half_perimeter / gear_radius)
+
+    # Offset by the tracing point, rotating around the gear's center. The gear centers are fresh
+    # arrays in theta's dtype, so unless out is given they become the outputs and are added to in
+    # place, as long as that is also the dtype of the result
+    sin_rotation, cos_rotation = sincos(gear_rotation)
+    cos_rotation *= tracing_point_dist
+    sin_rotation *= tracing_point_dist
+    if out is not None:
+        x_transformed, y_transformed = out
+    elif gear_center_x.dtype == np.result_type(x, y, theta):
+        x_transformed, y_transformed = gear_center_x, gear_center_y
+    else:
+        x_transformed, y_transformed = _result_buffers(x, y, theta)
+    np.add(gear_center_x, cos_rotation, out=x_transformed)
+    x_transformed += x
+    np.add(gear_center_y, sin_rotation, out=y_transformed)
+    y_transformed += y
 
     return x_transformed, y_transformed
 
 
-def elliptical_spirograph_transform(x, y, theta, R, r, d, a, b, mode):
+def elliptical_spirograph_transform(x, y, theta, R, r, d, a, b, mode, out=None):
     """
     Generates a spirograph pattern with an ellipse as the rolling element.
     :param x: Initial x coordinates (starting point array)
@@ -171,21 +143,40 @@ def elliptical_spirograph_transform(x, y, theta, R, r, d, a, b, mode):
     :param a: Semi-major axis of the ellipse
     :param b: Semi-minor axis of the ellipse
     :param mode: Type of spirograph ('hypotrochoid' or 'epitrochoid')
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates (spirograph pattern)
     """
-    if mode == 'hypotrochoid':
-        x_transformed = x + (R - r) * np.cos(theta) + d * (a / r) * np.cos(((R - r) / r) * theta)
-        y_transformed = y + (R - r) * np.sin(theta) - d * (b / r) * np.sin(((R - r) / r) * theta)
-    elif mode == 'epitrochoid':
-        x_transformed = x + (R + r) * np.cos(theta) - d * (a / r) * np.cos(((R + r) / r) * theta)
-        y_transformed = y + (R + r) * np.sin(theta) - d * (b / r) * np.sin(((R + r) / r) * theta)
-    else:
+    sign = TROCHOID_SIGNS.get(mode)
+    if sign is None:
         raise ValueError("Invalid mode. Use 'hypotrochoid' or 'epitrochoid'.")
+
+    # Scalar coefficients, computed once before any array work: R - r and +d for a hypotrochoid,
+    # R + r and -d for an epitrochoid
+    center_radius = R + sign * r
+    roll_rate = center_radius / r
+    pen_x = -sign * d * (a / r)
+    pen_y = -d * (b / r)
+    x_out, y_out = (None, None) if out is None else out
+    if PREFER_TRIG_KERNELS:
+        return _trochoid(x, y, theta, center_radius, roll_rate, pen_x, pen_y, x_out, y_out)
+    if prefer_numexpr_trig(theta.dtype):
+        return _trochoid_numexpr(x, y, theta, center_radius, roll_rate, pen_x, pen_y, x_out, y_out)
+
+    sin_theta, cos_theta = sincos(theta)
+    sin_roll, cos_roll = sincos(roll_rate * theta)
+    cos_theta *= center_radius
+    cos_roll *= pen_x
+    x_transformed = np.add(x, cos_theta, out=x_out)
+    x_transformed += cos_roll
+    sin_theta *= center_radius
+    sin_roll *= pen_y
+    y_transformed = np.add(y, sin_theta, out=y_out)
+    y_transformed += sin_roll
     return x_transformed, y_transformed
 
 
 
-def spirograph_transform(x, y, theta, R, r, d, mode):
+def spirograph_transform(x, y, theta, R, r, d, mode, out=None):
     """
     Generates spirograph pattern points from an initial point.
     :param x: Initial x coordinate (starting point)
@@ -195,15 +186,128 @@ def spirograph_transform(x, y, theta, R, r, d, mode):
     :param r: Radius of the rolling circle
     :param d: Distance from the center of the rolling circle to the drawing point
     :param mode: Type of spirograph ('hypotrochoid' or 'epitrochoid')
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates (spirograph pattern)
     """
+    # Unless given, x and y are the two rows of one contiguous buffer
+    points = np.empty((2,) + theta.shape, dtype=np.result_type(x, y, theta)) if out is None else out
+    x_transformed, y_transformed = spirograph_transform_soa(points, x, y, theta, R, r, d, mode)
+    return x_transformed, y_transformed
 
-    if mode == 'hypotrochoid':
-        x_transformed = x + (R - r) * np.cos(theta) + d * np.cos(((R - r) / r) * theta)
-        y_transformed = y + (R - r) * np.sin(theta) - d * np.sin(((R - r) / r) * theta)
-    elif mode == 'epitrochoid':
-        x_transformed = x + (R + r) * np.cos(theta) - d * np.cos(((R + r) / r) * theta)
-        y_transformed = y + (R + r) * np.sin(theta) - d * np.sin(((R + r) / r) * theta)
-    else:
+
+def spirograph_transform_soa(points_out, x, y, theta, R, r, d, mode):
+    """
+    Generates spirograph pattern points from an initial point, writing them into a caller-provided
+    (2, N) buffer instead of allocating new arrays.
+    :param points_out: (2, N) array (or (x, y) pair of arrays); row 0 receives the x coordinates and row 1
+                       the y coordinates
+    :param x: Initial x coordinate (starting point)
+    :param y: Initial y coordinate (starting point)
+    :param theta: Array of N angle values
+    :param R: Radius of the fixed circle
+    :param r: Radius of the rolling circle
+    :param d: Distance from the center of the rolling circle to the drawing point
+    :param mode: Type of spirograph ('hypotrochoid' or 'epitrochoid')
+    :return: points_out
+    """
+    sign = TROCHOID_SIGNS.get(mode)
+    if sign is None:
         raise ValueError("Invalid mode. Use 'hypotrochoid' or 'epitrochoid'.")
-    return x_transformed, y_transformed
\ No newline at end of file
+
+    # Scalar coefficients, computed once before any array work: R - r and +d for a hypotrochoid,
+    # R + r and -d for an epitrochoid
+    center_radius = R + sign * r
+    roll_rate = center_radius / r
+    pen_x = -sign * d
+    x_out, y_out = points_out
+    if PREFER_TRIG_KERNELS:
+        _trochoid(x, y, theta, center_radius, roll_rate, pen_x, -d, x_out, y_out)
+        return points_out
+    if prefer_numexpr_trig(theta.dtype):
+        _trochoid_numexpr(x, y, theta, center_radius, roll_rate, pen_x, -d, x_out, y_out)
+        return points_out
+
+    sin_theta, cos_theta = sincos(theta)
+    sin_roll, cos_roll = sincos(roll_rate * theta)
+    np.multiply(cos_theta, center_radius, out=x_out)
+    cos_roll *= pen_x
+    x_out += cos_roll
+    x_out += x
+    np.multiply(sin_theta, center_radius, out=y_out)
+    sin_roll *= d
+    y_out -= sin_roll
+    y_out += y
+    return points_out
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _trochoid_kernel(x, y, theta, center_radius, roll_rate, pen_x, pen_y, out_x, out_y):
+    # Scalar form shared by the spirograph transforms, one fused pass over theta
+    for i in prange(theta.shape[0]):
+        angle = theta[i]
+        roll_angle = roll_rate * angle
+        out_x[i] = x[i] + center_radius * math.cos(angle) + pen_x * math.cos(roll_angle)
+        out_y[i] = y[i] + center_radius * math.sin(angle) + pen_y * math.sin(roll_angle)
+
+
+def _trochoid(x, y, theta, center_radius, roll_rate, pen_x, pen_y, out_x=None, out_y=None):
+    """
+    Evaluates x + center_radius * cos(theta) + pen_x * cos(roll_rate * theta) (and likewise y with sin)
+    with the numba kernel, the common form of the hypo- and epi- variants of the spirograph transforms.
+    :param x: Initial x coordinates (array or scalar)
+    :param y: Initial y coordinates (array or scalar)
+    :param theta: Array of angle values
+    :param center_radius: Radius of the path traced by the center of the rolling element
+    :param roll_rate: Rotations of the rolling element per rotation of theta
+    :param pen_x: Signed x distance factor of the drawing point from the rolling element's center
+    :param pen_y: Signed y distance factor of the drawing point from the rolling element's center
+    :param out_x: Optional array to write the x coordinates into
+    :param out_y: Optional array to write the y coordinates into
+    :return: Transformed x and y coordinates
+    """
+    # Scalar starting points become zero-stride views rather than filled arrays, in the result dtype
+    # (float64 starting points stay float64 even for float32 theta)
+    dtype = np.result_type(x, y, theta)
+    x = np.broadcast_to(np.asarray(x, dtype=dtype), theta.shape)
+    y = np.broadcast_to(np.asarray(y, dtype=dtype), theta.shape)
+
+    x_transformed = np.empty(theta.shape, dtype) if out_x is None else out_x
+    y_transformed = np.empty(theta.shape, dtype) if out_y is None else out_y
+    # Coefficients in the result dtype, so float32 inputs compile to a float32 kernel end to end
+    scalar_type = dtype.type
+    _trochoid_kernel(x, y, theta, scalar_type(center_radius), scalar_type(roll_rate), scalar_type(pen_x),
+                     scalar_type(pen_y), x_transformed, y_transformed)
+    return x_transformed, y_transformed
+
+
+def _trochoid_numexpr(x, y, theta, center_radius, roll_rate, pen_x, pen_y, out_x=None, out_y=None):
+    """
+    numexpr version of _trochoid: each coordinate is a single blocked pass with no temporaries.
+    :param x: Initial x coordinates (array or scalar)
+    :param y: Initial y coordinates (array or scalar)
+    :param theta: Array of angle values
+    :param center_radius: Radius of the path traced by the center of the rolling element
+    :param roll_rate: Rotations of the rolling element per rotation of theta
+    :param pen_x: Signed x distance factor of the drawing point from the rolling element's center
+    :param pen_y: Signed y distance factor of the drawing point from the rolling element's center
+    :param out_x: Optional array to write the x coordinates into
+    :param out_y: Optional array to write the y coordinates into
+    :return: Transformed x and y coordinates
+    """
+    x_transformed = numexpr_evaluate("x + center_radius * cos(theta) + pen_x * cos(roll_rate * theta)", theta,
+                                     out=out_x, x=x, center_radius=center_radius, pen_x=pen_x, roll_rate=roll_rate)
+    y_transformed = numexpr_evaluate("y + center_radius * sin(theta) + pen_y * sin(roll_rate * theta)", theta,
+                                     out=out_y, y=y, center_radius=center_radius, pen_y=pen_y, roll_rate=roll_rate)
+    return x_transformed, y_transformed
+
+
+def _result_buffers(x, y, theta):
+    """
+    :param x: Initial x coordinates (array or scalar)
+    :param y: Initial y coordinates (array or scalar)
+    :param theta: Array of angle values
+    :return: Two empty arrays for the transformed x and y, in the result dtype of x, y and theta
+    """
+    shape = np.broadcast_shapes(np.shape(x), np.shape(y), theta.shape)
+    dtype = np.result_type(x, y, theta)
+    return np.empty(shape, dtype), np.empty(shape, dtype)
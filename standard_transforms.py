@@ -1,6 +1,11 @@
+import math
+from functools import lru_cache
+
 import numpy as np
 
-def circular_motion(x, y, theta, radius=50, speed=0.01):
+from accelerators import PREFER_TRIG_KERNELS, njit, numexpr_evaluate, prefer_numexpr_trig, prange, sincos
+
+def circular_motion(x, y, theta, radius=50, speed=0.01, out=None):
     """
     Transforms the drawing coordinates by simulating drawing on a piece of paper
     that is rotating in a circular motion.
@@ -9,14 +14,20 @@ def circular_motion(x, y, theta, radius=50, speed=0.01):
     :param theta: Angle values
     :param radius: Radius of the circular motion
     :param speed: Speed of the circular motion
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates
     """
-    x_transformed = x + radius * np.cos(speed * theta)
-    y_transformed = y + radius * np.sin(speed * theta)
+    x_out, y_out = (None, None) if out is None else out
+    sin_motion, cos_motion = sincos(speed * theta)
+    cos_motion *= radius
+    sin_motion *= radius
+    x_transformed = np.add(x, cos_motion, out=x_out)
+    y_transformed = np.add(y, sin_motion, out=y_out)
     return x_transformed, y_transformed
 
 
-def translate_scale_rotate_transform(x, y, theta, x_offset=0, y_offset=0, scale_x=1.0, scale_y=1.0, rotation_angle=0):
+def translate_scale_rotate_transform(x, y, theta, x_offset=0, y_offset=0, scale_x=1.0, scale_y=1.0, rotation_angle=0,
+                                     out=None):
     """
     Transforms the drawing coordinates to translate, scale (independently in x and y), and rotate the entire pattern.
     :param x: Original x coordinates
@@ -27,51 +38,149 @@ def translate_scale_rotate_transform(x, y, theta, x_offset=0, y_offset=0, scale_
     :param scale_x: Factor by which to scale the pattern along the x-axis (values > 1 enlarge, < 1 shrink)
     :param scale_y: Factor by which to scale the pattern along the y-axis (values > 1 enlarge, < 1 shrink)
     :param rotation_angle: The angle to rotate the pattern in degrees (counterclockwise)
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates
     """
-    # Scale the pattern independently along x and y axes
-    x_transformed = x * scale_x
-    y_transformed = y * scale_y
+    if rotation_angle == 0:
+        # Without rotation the matrix is diagonal, so skip the cross terms (or everything but a copy,
+        # for the identity; callers get new arrays, as from every other transform)
+        x_out, y_out = (None, None) if out is None else out
+        if scale_x == 1 and scale_y == 1:
+            if x_offset == 0 and y_offset == 0:
+                if out is None:
+                    return np.array(x, copy=True), np.array(y, copy=True)
+                np.copyto(x_out, x)
+                np.copyto(y_out, y)
+                return x_out, y_out
+            return np.add(x, x_offset, out=x_out), np.add(y, y_offset, out=y_out)
+        x_final = np.multiply(x, scale_x, out=x_out)
+        x_final += x_offset
+        y_final = np.multiply(y, scale_y, out=y_out)
+        y_final += y_offset
+        return x_final, y_final
+
+    (xx, xy), (yx, yy) = _scale_rotate_matrix(scale_x, scale_y, rotation_angle)
+
+    # Scale and rotate the pattern, then translate it, filling two output buffers in place
+    x_final, y_final, scratch = _point_buffers(x, y, out=out)
+    np.multiply(x, xx, out=x_final)
+    np.multiply(y, xy, out=scratch)
+    x_final += scratch
+    x_final += x_offset
+    np.multiply(x, yx, out=y_final)
+    np.multiply(y, yy, out=scratch)
+    y_final += scratch
+    y_final += y_offset
 
-    # Convert the rotation angle to radians
-    rotation_radians = np.deg2rad(rotation_angle)
+    return x_final, y_final
 
-    # Rotate the pattern
-    x_rotated = x_transformed * np.cos(rotation_radians) - y_transformed * np.sin(rotation_radians)
-    y_rotated = x_transformed * np.sin(rotation_radians) + y_transformed * np.cos(rotation_radians)
 
-    # Translate the pattern
-    x_final = x_rotated + x_offset
-    y_final = y_rotated + y_offset
+def translate_scale_rotate_points(points, x_offset=0, y_offset=0, scale_x=1.0, scale_y=1.0, rotation_angle=0,
+                                  out=None):
+    """
+    translate_scale_rotate_transform for points held as one (2, N) array of x and y rows: the scaling
+    and rotation are a single 2x2 matrix product over the whole buffer.
+    :param points: (2, N) array; row 0 holds the x coordinates and row 1 the y coordinates
+    :param x_offset: The distance to move the pattern along the x-axis
+    :param y_offset: The distance to move the pattern along the y-axis
+    :param scale_x: Factor by which to scale the pattern along the x-axis
+    :param scale_y: Factor by which to scale the pattern along the y-axis
+    :param rotation_angle: The angle to rotate the pattern in degrees (counterclockwise)
+    :param out: Optional (2, N) array to write the result into (must not be points itself)
+    :return: Transformed (2, N) array of points
+    """
+    matrix = np.array(_scale_rotate_matrix(scale_x, scale_y, rotation_angle), dtype=points.dtype)
+    out = np.matmul(matrix, points, out=out)
+    out += np.array([[x_offset], [y_offset]], dtype=points.dtype)
+    return out
+
 
-    return x_final, y_final
+def _scale_rotate_matrix(scale_x, scale_y, rotation_angle):
+    """
+    :param scale_x: Factor by which to scale along the x-axis
+    :param scale_y: Factor by which to scale along the y-axis
+    :param rotation_angle: The angle to rotate in degrees (counterclockwise)
+    :return: The 2x2 matrix that scales and then rotates, as nested tuples of Python floats
+    """
+    # Convert the rotation angle to radians
+    # (scalar math keeps these Python floats, so float32 coordinates aren't upcast)
+    rotation_radians = math.radians(rotation_angle)
+    cos_rotation = math.cos(rotation_radians)
+    sin_rotation = math.sin(rotation_radians)
 
+    # Fold the independent x and y scaling into the rotation matrix
+    return ((scale_x * cos_rotation, -scale_y * sin_rotation),
+            (scale_x * sin_rotation, scale_y * cos_rotation))
 
 
-def paper_rotation(x, y, theta, degrees):
+def paper_rotation(x, y, theta, degrees, theta_max=None, out=None):
     """
     Transforms the drawing coordinates to simulate the paper rotating during the drawing process.
+    :param x: Original x coordinates
+    :param y: Original y coordinates
+    :param theta: Angle values (progress parameter)
+    :param degrees: Total rotation angle of the paper in degrees during the drawing process.
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1]).
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
+    :return: Transformed x and y coordinates.
     """
-    total_rotation_radians = np.deg2rad(degrees)
-    theta_max = theta[-1]
+    total_rotation_radians = math.radians(degrees)
+    theta_max = theta[-1] if theta_max is None else theta_max
+    if PREFER_TRIG_KERNELS or prefer_numexpr_trig(theta.dtype):
+        # phi is linear in theta, so the fused paths take it as a single rate
+        rotation_rate = total_rotation_radians / float(theta_max)
+        if PREFER_TRIG_KERNELS:
+            return _rotate_linear(x, y, theta, rotation_rate, out)
+        x_out, y_out = (None, None) if out is None else out
+        x_rotated = numexpr_evaluate("x * cos(rotation_rate * theta) - y * sin(rotation_rate * theta)", theta,
+                                     out=x_out, x=x, y=y, rotation_rate=rotation_rate)
+        y_rotated = numexpr_evaluate("x * sin(rotation_rate * theta) + y * cos(rotation_rate * theta)", theta,
+                                     out=y_out, x=x, y=y, rotation_rate=rotation_rate)
+        return x_rotated, y_rotated
     phi = (theta / theta_max) * total_rotation_radians
-    x_transformed = x * np.cos(phi) - y * np.sin(phi)
-    y_transformed = x * np.sin(phi) + y * np.cos(phi)
-    return x_transformed, y_transformed
+    sin_phi, cos_phi = sincos(phi)
+    return _rotate(x, y, cos_phi, sin_phi, out)
 
-def mystery_lines(x,y,theta,spiral_rate, frequency):
+def mystery_lines(x, y, theta, spiral_rate, frequency, cos_theta=None, sin_theta=None, out=None):
+    """
+    Transforms the drawing coordinates along a spiral whose radius oscillates between 0 and 2 * spiral_rate.
+    :param x: Original x coordinates
+    :param y: Original y coordinates
+    :param theta: Angle values
+    :param spiral_rate: Average radius of the spiral, also used as the oscillation amplitude
+    :param frequency: Oscillations of the radius per radian of theta
+    :param cos_theta: Optional precomputed np.cos(theta)
+    :param sin_theta: Optional precomputed np.sin(theta)
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
+    :return: Transformed x and y coordinates
+    """
+    x_out, y_out = (None, None) if out is None else out
     amplitude = spiral_rate  # Fixed amplitude for even spiraling
-    r = spiral_rate + amplitude * np.sin(frequency * theta)
+    if cos_theta is None or sin_theta is None:
+        if prefer_numexpr_trig(theta.dtype):
+            r = numexpr_evaluate("spiral_rate + amplitude * sin(frequency * theta)", theta,
+                                 spiral_rate=spiral_rate, amplitude=amplitude, frequency=frequency)
+            x_transformed = numexpr_evaluate("x + r * cos(theta)", theta, out=x_out, x=x, r=r)
+            y_transformed = numexpr_evaluate("y + r * sin(theta)", theta, out=y_out, y=y, r=r)
+            return x_transformed, y_transformed
+        sin_theta, cos_theta = sincos(theta)
+
+    # Build r in a single buffer
+    r = np.multiply(frequency, theta)
+    np.sin(r, out=r)
+    r *= amplitude
+    r += spiral_rate
 
     # Apply the spiral transformation
-    x_transformed = x + r * np.sin(theta)
-    y_transformed = y + r * np.sin(theta)
+    x_transformed = np.multiply(r, cos_theta, out=x_out)
+    x_transformed += x
+    y_transformed = np.multiply(r, sin_theta, out=y_out)
+    y_transformed += y
 
     return x_transformed, y_transformed
 
 
-
-def linear_translation_transform(x, y, theta, total_distance, movement_angle_degrees):
+def linear_translation_transform(x, y, theta, total_distance, movement_angle_degrees, theta_max=None, out=None):
     """
     Transforms the drawing coordinates to move the diagram along a straight line during drawing.
     :param x: Original x coordinates.
@@ -79,30 +188,32 @@ def linear_translation_transform(x, y, theta, total_distance, movement_angle_deg
     :param theta: Array of angle values representing the drawing progression.
     :param total_distance: Total distance to move the diagram during the drawing process.
     :param movement_angle_degrees: Angle (in degrees) along which to move the diagram.
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1]).
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates.
     """
+    x_out, y_out = (None, None) if out is None else out
+
     # Convert angle from degrees to radians
-    movement_angle = np.deg2rad(movement_angle_degrees)
+    movement_angle = math.radians(movement_angle_degrees)
 
     # Calculate the maximum value of theta
-    theta_max = theta[-1]
+    theta_max = theta[-1] if theta_max is None else theta_max
 
     # Compute normalized progression p(theta)
     p = theta / theta_max
 
-    # Compute translation amounts
-    delta_x = p * total_distance * np.cos(movement_angle)
-    delta_y = p * total_distance * np.sin(movement_angle)
-
-    # Apply translation to x and y
-    x_transformed = x + delta_x
-    y_transformed = y + delta_y
+    # Compute translation amounts, then apply them to x and y in the same buffers
+    x_transformed = np.multiply(p, total_distance * math.cos(movement_angle), out=x_out)
+    x_transformed += x
+    y_transformed = np.multiply(p, total_distance * math.sin(movement_angle), out=y_out)
+    y_transformed += y
 
     return x_transformed, y_transformed
 
 
 
-def paper_rotation_transform_non_linear(x, y, theta, degrees, rotation_rate_function):
+def paper_rotation_transform_non_linear(x, y, theta, degrees, rotation_rate_function, theta_max=None, out=None):
     """
     Transforms the drawing coordinates to simulate the paper rotating during the drawing process with a non-linear rotation rate.
     :param x: Original x coordinates
@@ -110,33 +221,40 @@ def paper_rotation_transform_non_linear(x, y, theta, degrees, rotation_rate_func
     :param theta: Angle values (progress parameter)
     :param degrees: Total rotation angle of the paper in degrees during the drawing process.
     :param rotation_rate_function: Defines the rotation rate ('linear', 'quadratic', 'sinusoidal', or a custom function).
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1]).
+    :param out: Optional (x, y) pair of arrays to write the result into (must not share memory with x or y)
     :return: Transformed x and y coordinates.
     """
-    total_rotation_radians = np.deg2rad(degrees)
-    theta_max = theta[-1]
+    total_rotation_radians = math.radians(degrees)
+    theta_max = theta[-1] if theta_max is None else theta_max
     normalized_theta = theta / theta_max  # Normalize theta to range from 0 to 1
 
+    # The built-in rate functions turn normalized_theta into phi in place, in a single buffer
     if rotation_rate_function == 'linear':
-        phi = normalized_theta * total_rotation_radians
+        phi = normalized_theta
+        phi *= total_rotation_radians
     elif rotation_rate_function == 'quadratic':
-        phi = normalized_theta ** 2 * total_rotation_radians
+        phi = np.square(normalized_theta, out=normalized_theta)
+        phi *= total_rotation_radians
     elif rotation_rate_function == 'sinusoidal':
-        phi = np.sin(normalized_theta * np.pi / 2) * total_rotation_radians
+        normalized_theta *= np.pi / 2
+        phi = np.sin(normalized_theta, out=normalized_theta)
+        phi *= total_rotation_radians
     elif callable(rotation_rate_function):
         phi_normalized = rotation_rate_function(normalized_theta)
-        # Ensure phi_normalized is within [0, 1]
-        phi_normalized = np.clip(phi_normalized, 0, 1)
-        phi = phi_normalized * total_rotation_radians
+        # Ensure phi_normalized is within [0, 1], clipping into a fresh buffer: the callable's
+        # result may be an array it still owns, or read-only
+        phi = np.clip(phi_normalized, 0, 1, out=np.empty(np.shape(phi_normalized), normalized_theta.dtype))
+        phi *= total_rotation_radians
     else:
         raise ValueError(
             "Invalid rotation_rate_function. Use 'linear', 'quadratic', 'sinusoidal', or provide a function.")
 
-    x_transformed = x * np.cos(phi) - y * np.sin(phi)
-    y_transformed = x * np.sin(phi) + y * np.cos(phi)
-    return x_transformed, y_transformed
+    sin_phi, cos_phi = sincos(phi)
+    return _rotate(x, y, cos_phi, sin_phi, out)
 
 
-def svg_path_transform(x, y, theta, svg_path, scale=1.0, offset_x=0.0, offset_y=0.0):
+def svg_path_transform(x, y, theta, svg_path, scale=1.0, offset_x=0.0, offset_y=0.0, theta_max=None, out=None):
     """
     Transforms the drawing coordinates to trace along the SVG path efficiently.
     :param x: Original x coordinates.
@@ -146,43 +264,244 @@ def svg_path_transform(x, y, theta, svg_path, scale=1.0, offset_x=0.0, offset_y=
     :param scale: Scaling factor for the SVG path.
     :param offset_x: X-axis offset for the SVG path.
     :param offset_y: Y-axis offset for the SVG path.
+    :param theta_max: Optional final angle of the pattern (defaults to theta[-1]).
+    :param out: Optional (x, y) pair of arrays to write the result into
     :return: Transformed x and y coordinates.
     """
     # Normalize theta to range from 0 to 1
-    theta_normalized = theta / theta[-1]
+    theta_normalized = theta / (theta[-1] if theta_max is None else theta_max)
 
-    # Total length of the SVG path
-    total_length = svg_path.length()
+    # Arclength table of the path, built once per path
+    segment_polys, segment_offsets, knot_lengths = _path_arclength_table(svg_path)
 
-    # Compute the corresponding distances along the path for each theta
-    distances = theta_normalized * total_length
+    # Compute the corresponding distances along the path for each theta (clamped to the path)
+    distances = np.multiply(theta_normalized, segment_offsets[-1], dtype=np.float64)
+    np.clip(distances, 0, segment_offsets[-1], out=distances)
 
-    # Precompute t values and cumulative lengths
-    num_samples = 10000  # Adjust based on desired accuracy and performance
-    t_vals = np.linspace(0, 1, num_samples)
-    cumulative_lengths = np.array([svg_path.length(0, t) for t in t_vals])
+    # Find the segment and segment parameter at each distance
+    segment_index, segment_t = _path_parameters(svg_path, segment_polys, segment_offsets, knot_lengths, distances)
 
-    # Ensure cumulative_lengths is strictly increasing for interpolation
-    # This avoids potential issues with np.interp
-    cumulative_lengths = np.maximum.accumulate(cumulative_lengths)
+    # Get the points on the path at those parameters
+    points = _path_points(svg_path, segment_polys, segment_index, segment_t)
 
-    # Handle any potential floating-point inaccuracies
-    cumulative_lengths[-1] = total_length
+    # Apply scaling and offset to the x and y coordinates of the points, writing them in the
+    # precision the rest of the pattern is drawn in
+    path_x, path_y = (np.empty_like(theta), np.empty_like(theta)) if out is None else out
+    np.add(points.real * scale, offset_x, out=path_x)
+    np.add(points.imag * scale, offset_y, out=path_y)
+    return path_x, path_y
 
-    # Interpolate to find t for each desired distance
-    t_values = np.interp(distances, cumulative_lengths, t_vals)
 
-    # Get the points on the path at the specified t values using list comprehension
-    # This avoids passing an array to svg_path.point, which expects scalar t
-    points = [svg_path.point(t) for t in t_values]
+# Gauss-Legendre rule on [0, 1] used to integrate segment speed, and the number of pieces each
+# segment's arclength table is split into
+GAUSS_LEGENDRE_NODES, GAUSS_LEGENDRE_WEIGHTS = np.polynomial.legendre.leggauss(8)
+GAUSS_LEGENDRE_NODES = (GAUSS_LEGENDRE_NODES + 1) / 2
+GAUSS_LEGENDRE_WEIGHTS = GAUSS_LEGENDRE_WEIGHTS / 2
+ARCLENGTH_PIECES = 32
 
-    # Extract x and y coordinates from the points
-    path_x = np.array([point.real for point in points])
-    path_y = np.array([point.imag for point in points])
 
-    # Apply scaling and offset
-    path_x = path_x * scale + offset_x
-    path_y = path_y * scale + offset_y
+@lru_cache(maxsize=32)
+def _path_arclength_table(svg_path):
+    """
+    Builds the table svg_path_transform uses to go from distance along an SVG path to a point on it.
+    Each segment is split into ARCLENGTH_PIECES pieces whose lengths come from Gauss-Legendre
+    quadrature of the segment's speed. Cached per path; paths hash by their points, so an edited
+    path gets a fresh table.
+    :param svg_path: The SVG Path object.
+    :return: Tuple of (segment_polys, segment_offsets, knot_lengths): the segments' cubic coefficients
+             (see _segment_poly), the distance along the path at which each segment starts (plus the
+             total length at the end), and the (segments, ARCLENGTH_PIECES + 1) distances into each
+             segment at its knots u = k / ARCLENGTH_PIECES.
+    """
+    segment_polys = np.array([_segment_poly(segment) for segment in svg_path], dtype=complex).reshape(-1, 4)
+    num_segments = len(segment_polys)
 
-    return path_x, path_y
+    knots = np.linspace(0, 1, ARCLENGTH_PIECES + 1)
+    segment_index = np.repeat(np.arange(num_segments), ARCLENGTH_PIECES)
+    piece_lengths = _integrate_speed(svg_path, segment_polys, segment_index,
+                                     np.tile(knots[:-1], num_segments), np.tile(knots[1:], num_segments))
+
+    knot_lengths = np.zeros((num_segments, ARCLENGTH_PIECES + 1))
+    np.cumsum(piece_lengths.reshape(num_segments, ARCLENGTH_PIECES), axis=1, out=knot_lengths[:, 1:])
+    segment_offsets = np.concatenate(([0.0], np.cumsum(knot_lengths[:, -1])))
+    return segment_polys, segment_offsets, knot_lengths
+
+
+def _path_parameters(svg_path, segment_polys, segment_offsets, knot_lengths, distances):
+    """
+    Inverts the arclength table: interpolates linearly between knots, then refines with a Newton step.
+    :param svg_path: The SVG Path object.
+    :param segment_polys: Cubic coefficients of each segment (see _path_arclength_table).
+    :param segment_offsets: Distance at which each segment starts (see _path_arclength_table).
+    :param knot_lengths: Distances into each segment at its knots (see _path_arclength_table).
+    :param distances: Array of distances along the path, within [0, total length].
+    :return: Tuple of (segment_index, segment_t) arrays.
+    """
+    # Distance along the whole path at the start of every piece, in path order
+    piece_starts = (segment_offsets[:-1, None] + knot_lengths[:, :-1]).ravel()
+    piece_lengths = np.diff(knot_lengths, axis=1).ravel()
+    piece = np.clip(np.searchsorted(piece_starts, distances, side='right') - 1, 0, len(piece_starts) - 1)
+    segment_index, knot = np.divmod(piece, ARCLENGTH_PIECES)
+    knot_t = knot / ARCLENGTH_PIECES
+
+    # Linear guess within the piece
+    into_piece = distances - piece_starts[piece]
+    lengths = piece_lengths[piece]
+    fraction = np.divide(into_piece, lengths, out=np.zeros_like(into_piece), where=lengths > 0)
+    segment_t = knot_t + np.clip(fraction, 0, 1) / ARCLENGTH_PIECES
+
+    # Newton step on arclength(t) - distance, whose derivative is the speed at t
+    error = _integrate_speed(svg_path, segment_polys, segment_index, knot_t, segment_t) - into_piece
+    speed = _segment_speed(svg_path, segment_polys, segment_index, segment_t)
+    segment_t -= np.divide(error, speed, out=np.zeros_like(error), where=speed > 0)
+    np.clip(segment_t, 0, 1, out=segment_t)
+    return segment_index, segment_t
+
+
+def _integrate_speed(svg_path, segment_polys, segment_index, t_start, t_end):
+    """
+    Gauss-Legendre quadrature of the speed |p'(t)| of each given segment between t_start and t_end.
+    :param svg_path: The SVG Path object.
+    :param segment_polys: Cubic coefficients of each segment (see _path_arclength_table).
+    :param segment_index: Array of segment indices.
+    :param t_start: Array of segment parameters to integrate from, one per segment_index entry.
+    :param t_end: Array of segment parameters to integrate to, one per segment_index entry.
+    :return: Array of arclengths, one per segment_index entry.
+    """
+    widths = t_end - t_start
+    nodes = t_start[:, None] + widths[:, None] * GAUSS_LEGENDRE_NODES
+    speeds = _segment_speed(svg_path, segment_polys, np.broadcast_to(segment_index[:, None], nodes.shape), nodes)
+    return (speeds @ GAUSS_LEGENDRE_WEIGHTS) * widths
+
+
+def _segment_speed(svg_path, segment_polys, segment_index, segment_t):
+    """
+    :param svg_path: The SVG Path object.
+    :param segment_polys: Cubic coefficients of each segment (see _path_arclength_table).
+    :param segment_index: Array of segment indices.
+    :param segment_t: Array of segment parameters in [0, 1], the same shape as segment_index.
+    :return: |p'(t)| of each given segment at each given t.
+    """
+    # Lines and Bezier curves: differentiate the cubic, c1 + t * (2 * c2 + t * 3 * c3)
+    _, c1, c2, c3 = np.moveaxis(segment_polys[segment_index], -1, 0)
+    derivative = 3 * c3 * segment_t
+    derivative += 2 * c2
+    derivative *= segment_t
+    derivative += c1
+
+    # Arcs have no polynomial form; their derivative() works elementwise
+    for index in np.flatnonzero(np.isnan(segment_polys[:, 0])):
+        on_arc = segment_index == index
+        if on_arc.any():
+            derivative[on_arc] = svg_path[index].derivative(segment_t[on_arc])
+    return np.abs(derivative)
+
+
+def _segment_poly(segment):
+    """
+    :param segment: A segment of an SVG path.
+    :return: Coefficients (c0, c1, c2, c3) with segment.point(t) = c0 + t * (c1 + t * (c2 + t * c3)),
+             or NaNs if the segment isn't a line or Bezier curve (i.e. an arc).
+    """
+    if not hasattr(segment, 'bpoints'):
+        return [np.nan] * 4
+    bpoints = segment.bpoints()
+    if len(bpoints) == 2:  # Line
+        p0, p1 = bpoints
+        return [p0, p1 - p0, 0, 0]
+    if len(bpoints) == 3:  # QuadraticBezier
+        p0, p1, p2 = bpoints
+        return [p0, 2 * (p1 - p0), p0 - 2 * p1 + p2, 0]
+    p0, p1, p2, p3 = bpoints  # CubicBezier
+    return [p0, 3 * (p1 - p0), 3 * (p0 - 2 * p1 + p2), -p0 + 3 * (p1 - p2) + p3]
+
+
+def _path_points(svg_path, segment_polys, segment_index, segment_t):
+    """
+    Vectorized equivalent of [svg_path[i].point(t) for i, t in zip(segment_index, segment_t)].
+    :param svg_path: The SVG Path object.
+    :param segment_polys: Cubic coefficients of each segment (see _path_arclength_table).
+    :param segment_index: Array of segment indices.
+    :param segment_t: Array of segment parameters in [0, 1].
+    :return: Complex array of points on the path.
+    """
+    # Lines and Bezier curves: evaluate every point's cubic at once, in Horner form
+    c0, c1, c2, c3 = segment_polys[segment_index].T
+    points = c3 * segment_t
+    points += c2
+    points *= segment_t
+    points += c1
+    points *= segment_t
+    points += c0
+
+    # Arcs have no polynomial form; their point() formula works elementwise, so each arc is one call
+    for index in np.flatnonzero(np.isnan(segment_polys[:, 0])):
+        on_arc = segment_index == index
+        if on_arc.any():
+            points[on_arc] = svg_path[index].point(segment_t[on_arc])
+    return points
+
+
+def _point_buffers(x, y, angle=None, out=None):
+    """
+    Allocates output buffers for a transform that maps x and y (and optionally a per-point angle).
+    :param x: Original x coordinates (array or scalar)
+    :param y: Original y coordinates (array or scalar)
+    :param angle: Optional angle array the outputs are also broadcast against
+    :param out: Optional (x, y) pair of arrays to use as the outputs instead of allocating them
+    :return: Three arrays: the transformed x, the transformed y, and an empty scratch buffer
+    """
+    shape = np.broadcast_shapes(np.shape(x), np.shape(y), np.shape(angle))
+    dtype = np.result_type(x, y) if angle is None else np.result_type(x, y, angle)
+    x_out, y_out = (np.empty(shape, dtype), np.empty(shape, dtype)) if out is None else out
+    return x_out, y_out, np.empty(shape, dtype)
 
+
+def _rotate(x, y, cos_phi, sin_phi, out=None):
+    """
+    Rotates each point by its own angle, writing into two output buffers and one scratch buffer
+    rather than a temporary per product.
+    :param x: Original x coordinates
+    :param y: Original y coordinates
+    :param cos_phi: Cosine of the rotation angle of each point
+    :param sin_phi: Sine of the rotation angle of each point
+    :param out: Optional (x, y) pair of arrays to write the result into
+    :return: Rotated x and y coordinates
+    """
+    x_rotated, y_rotated, scratch = _point_buffers(x, y, cos_phi, out)
+    np.multiply(x, cos_phi, out=x_rotated)
+    np.multiply(y, sin_phi, out=scratch)
+    x_rotated -= scratch
+    np.multiply(x, sin_phi, out=y_rotated)
+    np.multiply(y, cos_phi, out=scratch)
+    y_rotated += scratch
+    return x_rotated, y_rotated
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _rotate_linear_kernel(x, y, theta, rotation_rate, out_x, out_y):
+    # One sin/cos pair per point, shared by both outputs
+    for i in prange(theta.shape[0]):
+        phi = rotation_rate * theta[i]
+        cos_phi = math.cos(phi)
+        sin_phi = math.sin(phi)
+        out_x[i] = x[i] * cos_phi - y[i] * sin_phi
+        out_y[i] = x[i] * sin_phi + y[i] * cos_phi
+
+
+def _rotate_linear(x, y, theta, rotation_rate, out=None):
+    """
+    Rotates each point by rotation_rate * theta in a single numba pass.
+    :param x: Original x coordinates (array or scalar)
+    :param y: Original y coordinates (array or scalar)
+    :param theta: Array of angle values
+    :param rotation_rate: Rotation angle per unit of theta
+    :param out: Optional (x, y) pair of arrays to write the result into
+    :return: Rotated x and y coordinates
+    """
+    dtype = np.result_type(x, y, theta)
+    x = np.broadcast_to(np.asarray(x, dtype=dtype), theta.shape)
+    y = np.broadcast_to(np.asarray(y, dtype=dtype), theta.shape)
+    x_rotated, y_rotated = (np.empty(theta.shape, dtype), np.empty(theta.shape, dtype)) if out is None else out
+    _rotate_linear_kernel(x, y, theta, dtype.type(rotation_rate), x_rotated, y_rotated)
+    return x_rotated, y_rotated